@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+
+# benchmarks for the hot paths in main.py
+#
+# the scenario suite runs the real game headless and times each simulation
+# phase separately, the micro benchmarks time single techniques in isolation
+#
+# usage: python benchmark.py [--scenario NAME] [--frames N] [--output FILE]
+#        python benchmark.py --micro
+#        python benchmark.py --check
+
+import argparse
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+# run without opening a window or an audio device
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+import main as game
+
+# the game functions timed by the scenario suite. times are inclusive, so
+# player_shoot also contains the fire_projectile calls it makes
+TIMED_FUNCTIONS = [
+    'move_projectiles',
+    'collide',
+    'player_shoot',
+    'fire_projectile',
+    'handle_boss_logic',
+    'move_starfield',
+]
+
+SEED = 1
+
+
+###############################################################################
+# scenario suite
+###############################################################################
+
+class PhaseTimer:
+    # wraps game functions so every call adds to a per frame total. samples
+    # holds one total per frame for each function
+    def __init__(self, module, names):
+        self.paused = False
+        self.current = {name: 0.0 for name in names}
+        self.samples = {name: [] for name in names}
+        for name in names:
+            self.wrap(module, name)
+
+    def wrap(self, module, name):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            if self.paused:
+                return original(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.current[name] += time.perf_counter() - start
+
+        setattr(module, name, timed)
+
+    def end_frame(self):
+        for name in self.current:
+            self.samples[name].append(self.current[name])
+            self.current[name] = 0.0
+
+
+def summarize(samples):
+    ms = np.array(samples) * 1000
+    return {
+        'mean_ms': round(float(ms.mean()), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+
+
+def weaving_input(frames, keys=(pygame.K_SPACE,)):
+    # hold the given keys and weave up and down once a second
+    script = []
+    for frame in range(0, frames + 60, 60):
+        direction = pygame.K_UP if frame // 60 % 2 == 0 else pygame.K_DOWN
+        script.append((frame, list(keys) + [direction]))
+    return game.ScriptedInput(script)
+
+
+def make_immortal():
+    # keep both sides alive so the scenario does not end early
+    game.player.max_hp = game.player.hp = 10 ** 9
+    game.boss.max_hp = game.boss.hp = 10 ** 12
+
+
+def setup_spaghetti_barrage(frames):
+    game.start_level(8)
+    make_immortal()
+    game.input_source = weaving_input(frames)
+
+
+def setup_roy_carnassus(frames):
+    # like the level up screen's 'r' cheat: jump to level 15 and take the
+    # upgrades three times over, here every upgrade rather than the 3 offered
+    game.start_level(15)
+    upgrade_types = [value for name, value in vars(game.UpgradeType).items()
+                     if not name.startswith('_')]
+    for _ in range(3):
+        for upgrade_type in upgrade_types:
+            game.process_upgrade(upgrade_type)
+    make_immortal()
+    game.input_source = weaving_input(frames)
+
+
+def setup_trash_waves(frames):
+    game.start_level(4)
+    make_immortal()
+    for wave in range(4):
+        game.boss_summon(wave % 2 + 1)
+    game.input_source = weaving_input(frames)
+
+
+def top_up_trash_waves():
+    # replace the waves as they fly off screen and keep 2,000 bullets live
+    while len(game.swarm) < 16:
+        game.boss_summon(random.randint(1, 2))
+    while len(game.boss_projectiles) < 2000:
+        game.boss_projectiles.append(
+            game.fire_projectile(game.boss, game.player, 2, 1, game.ORANGE, 8, 6))
+
+
+def setup_trash_swarm(frames):
+    game.start_level(4)
+    make_immortal()
+    game.input_source = weaving_input(frames)
+
+
+def top_up_trash_swarm():
+    # keep 400 trash mobs in the air, 100 waves of 4
+    while len(game.swarm) < 400:
+        game.boss_summon(random.randint(1, 2))
+
+
+def setup_title_warp(frames):
+    # the title screen ramps the starfield up to warp speed
+    game.input_source = game.ScriptedInput()
+
+
+SCENARIOS = {
+    'spaghetti-barrage': {
+        'description': "level 8 spaghetti barrage, meatballs and noodles collide by sprite mask",
+        'setup': setup_spaghetti_barrage,
+    },
+    'roy-carnassus': {
+        'description': "level 15 Roy Carnassus with cheat 'r' triple upgrades",
+        'setup': setup_roy_carnassus,
+    },
+    'trash-waves': {
+        'description': "4 trash waves + 2,000 bullets",
+        'setup': setup_trash_waves,
+        'frame': top_up_trash_waves,
+    },
+    'trash-swarm': {
+        'description': "400 trash mobs flying and firing at once",
+        'setup': setup_trash_swarm,
+        'frame': top_up_trash_swarm,
+    },
+    'title-warp': {
+        'description': "title screen warp with a 20,000 star starfield",
+        'setup': setup_title_warp,
+        'starfield_size': 20000,
+    },
+}
+
+
+def run_scenario(name, frames):
+    global game
+
+    scenario = SCENARIOS[name]
+
+    # start every scenario from a freshly imported game so nothing leaks
+    # from one scenario into the next
+    game = importlib.reload(game)
+    random.seed(SEED)
+    np.random.seed(SEED)
+    game.starfield_size = scenario.get('starfield_size', game.starfield_size)
+    game.setup_game(True)
+    scenario['setup'](frames)
+
+    timer = PhaseTimer(game, TIMED_FUNCTIONS)
+    frame_times = []
+    for _ in range(frames):
+        if 'frame' in scenario:
+            timer.paused = True
+            scenario['frame']()
+            timer.paused = False
+
+        start = time.perf_counter()
+        game.run_frame()
+        frame_times.append(time.perf_counter() - start)
+        timer.end_frame()
+
+    # a frame has to fit in one display refresh, 99% of them at least
+    budget = 1000 / game.fps
+    result = {
+        'description': scenario['description'],
+        'frames': frames,
+        'budget_ms': round(budget, 4),
+        'frame': summarize(frame_times),
+    }
+    result['within_budget'] = result['frame']['p99_ms'] <= budget
+    for function in TIMED_FUNCTIONS:
+        result[function] = summarize(timer.samples[function])
+    return result
+
+
+def print_result(name, result):
+    print()
+    print(name + ": " + result['description'] + " (" + str(result['frames']) + " frames)")
+    print("  {0:<20}{1:>10}{2:>10}".format("", "mean ms", "p99 ms"))
+    for function in ['frame'] + TIMED_FUNCTIONS:
+        print("  {0:<20}{1:>10.3f}{2:>10.3f}".format(
+            function, result[function]['mean_ms'], result[function]['p99_ms']))
+    print("  frame budget " + "{0:.3f}".format(result['budget_ms']) + " ms, p99 " +
+          ("within budget" if result['within_budget'] else "OVER BUDGET"))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+###############################################################################
+# checks
+###############################################################################
+
+def check_level_start():
+    # --level waits for the loading screen, then starts the fight part way
+    # through a frame. the fight's first frame has to start the game clock
+    # and run a single tick rather than catching up on the time spent loading
+    global game
+
+    game = importlib.reload(game)
+    game.setup_game()
+    game.start_at_level = 8
+    while game.game_state != game.GameState.Game:
+        game.run_frame()
+
+    first_tick = game.tick
+    game.run_frame()
+    ticks = game.tick - first_tick
+
+    print("level start: " + str(ticks) + " tick(s) on the first frame of the fight")
+    return ticks == 1
+
+
+def run_checks():
+    passed = check_level_start()
+    pygame.quit()
+    return passed
+
+
+###############################################################################
+# micro benchmarks
+###############################################################################
+
+def time_frames(frame, frames):
+    # return the mean cost of a frame in milliseconds
+    start = time.perf_counter()
+    for _ in range(frames):
+        frame()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def bench_circle_masks(candidates=200, frames=200):
+    # time projectile_hits_ship with the circle masks cached by radius
+    # against clearing game.circle_masks before every test, so each circle
+    # builds its mask again the way it did before the cache. the ship is the
+    # flying spaghetti monster since most bullets end up near the boss
+    game.setup_game(True)
+    game.start_level(8)
+
+    random.seed(0)
+    left, top, right, bottom = game.ship_bounds(game.boss)
+    pool = game.ProjectilePool()
+    circles = [circle for circle in game.PROJECTILE_CIRCLES if not circle[2]]
+    for _ in range(candidates):
+        color, radius, heal = random.choice(circles)
+        pool.append(game.Projectile(
+            random.uniform(left, right), random.uniform(top, bottom),
+            0, 0, 5, color, radius))
+    projectiles = [game.PooledProjectile(pool, index) for index in range(len(pool))]
+
+    def uncached_frame():
+        for projectile in projectiles:
+            game.circle_masks.clear()
+            game.projectile_hits_ship(projectile, game.boss)
+
+    def cached_frame():
+        for projectile in projectiles:
+            game.projectile_hits_ship(projectile, game.boss)
+
+    uncached = time_frames(uncached_frame, frames)
+    cached = time_frames(cached_frame, frames)
+
+    print("circle masks, " + str(candidates) + " candidate projectiles per frame")
+    print("  uncached: " + "{0:.3f}".format(uncached) + " ms/frame")
+    print("  cached:   " + "{0:.3f}".format(cached) + " ms/frame")
+    print("  saved:    " + "{0:.3f}".format(uncached - cached) + " ms/frame (" +
+          "{0:.1f}".format(uncached / cached) + "x)")
+
+
+def bench_projectile_rendering(projectiles=2000, frames=200):
+    # compare drawing every projectile with its own draw call against the
+    # batched renderer, on a late game mix of circles, heals, sprites and
+    # projectiles showing their damage
+    game.setup_game(True)
+
+    random.seed(0)
+    pool = game.ProjectilePool()
+    circles = [circle for circle in game.PROJECTILE_CIRCLES if not circle[2]]
+    for _ in range(projectiles):
+        color, radius, heal = random.choice(circles)
+        projectile = game.Projectile(
+            random.uniform(0, game.width), random.uniform(0, game.height),
+            random.choice([-20, 20]), 0, random.choice([-1, 1]) * random.randint(1, 20),
+            color, radius,
+            type=random.choice([game.ProjectileType.Circle] * 4 + [
+                game.ProjectileType.Meatball, game.ProjectileType.Noodle,
+                game.ProjectileType.ForwardTorpedo]))
+        projectile.hit = random.random() < 0.05
+        pool.append(projectile)
+
+    def per_projectile_frame():
+        for projectile in pool:
+            projectile.draw()
+
+    def batched_frame():
+        game.projectile_renderer.draw(game.screen, (pool,))
+
+    per_projectile = time_frames(per_projectile_frame, frames)
+    batched = time_frames(batched_frame, frames)
+
+    print("projectile rendering, " + str(projectiles) + " projectiles per frame")
+    print("  per projectile: " + "{0:.3f}".format(per_projectile) + " ms/frame")
+    print("  batched:        " + "{0:.3f}".format(batched) + " ms/frame")
+    print("  saved:          " + "{0:.3f}".format(per_projectile - batched) + " ms/frame (" +
+          "{0:.1f}".format(per_projectile / batched) + "x)")
+
+
+def bench_occupancy_collisions(candidates=200, frames=200):
+    # compare testing every boss projectile near the player on its own
+    # against stamping them all into one occupancy mask first, on the
+    # common frame where none of them hit
+    game.setup_game(True)
+    game.player.x = game.width / 2
+    game.player.y = game.height / 2
+
+    random.seed(0)
+    left, top, right, bottom = game.ship_bounds(game.player)
+    pool = game.ProjectilePool()
+    circles = [circle for circle in game.PROJECTILE_CIRCLES if not circle[2]]
+    while len(pool) < candidates:
+        color, radius, heal = random.choice(circles)
+        projectile = game.Projectile(
+            random.uniform(left - radius, right + radius),
+            random.uniform(top - radius, bottom + radius),
+            0, 0, 5, color, radius)
+        if not game.projectile_hits_ship(projectile, game.player):
+            pool.append(projectile)
+    indices = np.arange(len(pool))
+
+    def per_projectile_frame():
+        for index in indices:
+            game.projectile_hits_ship(game.PooledProjectile(pool, index), game.player)
+
+    def occupancy_frame():
+        game.player_occupancy.overlaps(pool, indices, game.player)
+
+    per_projectile = time_frames(per_projectile_frame, frames)
+    occupancy = time_frames(occupancy_frame, frames)
+
+    print("occupancy collisions, " + str(candidates) + " candidate projectiles per frame, none hitting")
+    print("  per projectile: " + "{0:.3f}".format(per_projectile) + " ms/frame")
+    print("  occupancy:      " + "{0:.3f}".format(occupancy) + " ms/frame")
+    print("  saved:          " + "{0:.3f}".format(per_projectile - occupancy) + " ms/frame (" +
+          "{0:.1f}".format(per_projectile / occupancy) + "x)")
+
+
+def run_micro_benchmarks():
+    pygame.init()
+    pygame.display.set_mode((1280, 720))
+
+    bench_circle_masks()
+    bench_projectile_rendering()
+    bench_occupancy_collisions()
+
+    pygame.quit()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="benchmarks for main.py")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help="run only this scenario, may be repeated")
+    parser.add_argument('--frames', type=int, default=1200,
+                        help="frames to simulate per scenario")
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help="json file to write the scenario results to")
+    parser.add_argument('--micro', action='store_true',
+                        help="run the micro benchmarks instead of the scenarios")
+    parser.add_argument('--check', action='store_true',
+                        help="run the timing checks instead of the scenarios")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.check:
+        sys.exit(0 if run_checks() else 1)
+    elif args.micro:
+        run_micro_benchmarks()
+    else:
+        results = {}
+        for name in args.scenario or list(SCENARIOS):
+            results[name] = run_scenario(name, args.frames)
+
+        for name, result in results.items():
+            print_result(name, result)
+
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'scenarios': results,
+            }, f, indent=2)
+        print()
+        print("Results written to " + args.output)
+
+        pygame.quit()
@@ -36,6 +36,20 @@ import numpy as np
 import time
 import datetime
 import os
+import argparse
+import bisect
+import json
+import concurrent.futures
+import hashlib
+import io
+import mmap
+import zlib
+import struct
+import tempfile
+from collections import OrderedDict
+
+# startup time is reported from here
+launch_time = time.perf_counter()
 
 # let's define some colors
 
@@ -92,6 +106,7 @@ class GameState:
     StartLevel = 6
     Quit = 7
     Ending = 8
+    Loading = 9
 
 
 attack_power = 5
@@ -109,14 +124,22 @@ time_frame_start = time.time()
 frame_counter = 0
 frame_last_shot = 0
 game_state = last_game_state = GameState.Title
+headless = False
 height = 660
+input_source = None
 last_damage_done = 0
 ship_speed = 9
+simulated_time = 0.0
+simulating = False
 starfield_size = 300
 state_start_frame = 0
+state_start_tick = 0
 state_start_time = time.time()
-time_last_deflect = 0
-time_last_attack = 0
+tick = 0
+tick_time = 0.0
+# never deflected or attacked, whether the clock is real or simulated
+time_last_deflect = -math.inf
+time_last_attack = -math.inf
 volume: int = 10
 width = 1280
 upgrade_offers = []
@@ -131,8 +154,106 @@ FONT_SIZE_NORMAL = 24
 FONT_SIZE_SMALL = 16
 FONT_SIZE_TINY = 8
 
+# the game ticks at a fixed rate however fast frames are drawn. frames are
+# drawn part way between the last two ticks, unless something moved further
+# than this in one tick, and a stall longer than the max frame time is
+# dropped instead of caught up on
+SIMULATION_RATE = 120
+MAX_FRAME_TIME = 0.25
+INTERPOLATION_JUMP = 64
+
+GRID_CELL_SIZE = 64
+ASSET_CACHE_BYTES = 64 * 1024 * 1024
+
+# scaled and tinted sprites are kept on disk so the full size source images
+# only have to be decoded again when they change. python main.py --bake
+# builds every sprite ahead of time and removes stale ones
+BAKE_ASSETS = True
+BAKED_ASSET_DIR = 'baked'
+
+# --bake also packs everything loaded at startup, decoded, into one memory
+# mapped bundle that is read before the baked cache
+ASSET_BUNDLE = 'assets.bundle'
+BUNDLE_MAGIC = b'SPACEBN1'
+
+FONT_FILE = 'fonts/PressStart2P.ttf'
+
+# images and sounds needed at startup are read and decoded on up to one
+# thread per core
+ASSET_LOADER_WORKERS = min(4, os.cpu_count() or 1)
+
+# seconds per frame spent finishing loaded assets on the loading screen, and
+# once the title screen is up for the assets that stream in behind it
+LOADING_FRAME_BUDGET = 0.008
+STREAMING_FRAME_BUDGET = 0.002
+
+# sprites loaded at startup, as load_sprite arguments
+PLANET_IMAGES = [
+    'planet1', 'planet2', 'planet3', 'planet4', 'planet5', 'planet6',
+    'planet7', 'planet10', 'planet11', 'planet12', 'planet13', 'planet14',
+    'planet15', 'planet16', 'planet17', 'planet18_0', 'planet19', 'planet20',
+]
+MEATBALL_SPRITE = ("sprites/jwd-meatball.png", None, None, None, None, None, 1)
+NOODLE_SPRITE = ("ships/macaroni.png", None, None, None, None, None, 0.03)
+CONTROLS_SPRITE = ("sprites/jwd-move.png", None, None, None, None, None, 1)
+PLAYER_TORPEDO_SPRITE = ("sprites/kenney-player-torpedo.png", None, None, None, None, None, 0.75)
+PLAYER_SPRITE = ("ships/kenney-ship-3.png", None, None, None, None, None, 0.5)
+PLACEHOLDER_BOSS_SPRITE = ("ships/ships_3.png", 1, 1, 310, 150, (38, 37, 37), 1)
+TRASH_SPRITES = [
+    ("ships/trash1.gif", None, None, None, None, None, 0.5),
+    ("ships/trash2.gif", None, None, None, None, None, 1.25),
+]
+
+SOUND_FILES = {
+    "player_hit": 'sounds/player_hit.wav',
+    "player_death": 'sounds/player_death.wav',
+    "boss_hit": 'sounds/boss_hit.wav',
+    "player_heal": 'sounds/player_heal.wav',
+    "comm_bird": 'sounds/comm-bird.ogg',
+    "comm_bunny": 'sounds/comm-bunny.ogg',
+    "comm_fox": 'sounds/comm-fox.ogg',
+    "comm_frog": 'sounds/comm-frog.ogg',
+    "level_up": 'sounds/level_up.wav',
+    "deflect": 'sounds/deflect.wav',
+}
+# only heard once a level starts, so these stream in behind the title screen
+STREAMED_SOUNDS = ['comm_bird', 'comm_bunny', 'comm_fox', 'comm_frog']
+TEXT_CACHE_SIZE = 256
+
+# height of the hp bars drawn under the trash mobs
+SWARM_BAR_HEIGHT = 10
+
+# stamp the boss projectiles near the player into one mask and test it once
+# before testing them one at a time
+OCCUPANCY_COLLISIONS = False
+
+# frame time profiler overlay, toggled in game with F3
+PROFILER_HISTORY = 240
+PROFILER_GRAPH_HEIGHT = 120
+PROFILER_REFRESH = 30
+PROFILER_PHASES = [
+    ('events', (120, 120, 255)),
+    ('inputs', (0, 200, 255)),
+    ('boss logic', (0, 255, 160)),
+    ('move projectiles', (160, 255, 0)),
+    ('collide', (255, 255, 0)),
+    ('draw starfield', (255, 160, 0)),
+    ('draw projectiles', (255, 80, 80)),
+    ('hud', (255, 0, 255)),
+    ('flip', (180, 100, 255)),
+]
+
 HEAL_CHANCE = 4
 SHOW_PROJECTILE_VALUES = False
+ROTATION_STEPS = 360
+# the (colour, radius, heal) circles fired by boss_shoot, player_shoot and the
+# trash mob volleys, prerendered once the images have loaded
+PROJECTILE_CIRCLES = [
+    (YELLOW, 15, False), (ORANGE, 10, False), (RED, 10, False), (PURPLE, 10, False),
+    (GREEN, 15, True), (GREEN, 10, True),
+    (BLUE, 6, False), (CYAN, 6, False), (PURPLE, 6, False), (WHITE, 6, False),
+    (ORANGE, 8, False),
+]
 BOSS_BASE_HEALTH = 100
 
 # jukebox
@@ -150,8 +271,6 @@ COMM_SOUNDS = [
     'sounds/comm-frog.ogg',
 ]
 
-trash_mobs = []
-
 upgrades = [
     {
         'name': 'Attack Speed',
@@ -232,12 +351,18 @@ MOB_TYPE_HANGING = 2
 # MOB_TYPE_SNARE = 5
 
 
+def update_rate():
+    # how many times a second the running update is called. the game itself
+    # ticks at a fixed rate, every other screen updates once per frame
+    return SIMULATION_RATE if simulating else fps
+
+
 def fps_divisor():
-    return base_fps / fps
+    return base_fps / update_rate()
 
 
 def fps_scaler():
-    return fps / base_fps
+    return update_rate() / base_fps
 
 
 def boss_start_position():
@@ -283,8 +408,9 @@ class SpaceObject:
         self.y = random.randint(-20, 600)
 
     def move(self):
-        self.x += self.vx * background_speed * dt
-        self.y += self.vy * background_speed * dt
+        elapsed = 1 / update_rate() if simulating else dt
+        self.x += self.vx * background_speed * elapsed
+        self.y += self.vy * background_speed * elapsed
 
         if self.x < -width:
             self.resize()
@@ -295,63 +421,150 @@ class SpaceObject:
         screen.blit(self.sprite, (self.x, self.y))
 
 
-class Star:
-    def __init__(self):
-        self.x = random.randrange(0, width)
-        self.y = random.randrange(0, height)
-        self.speed = random.randrange(1, 8)
+class Starfield:
+    # every star lives in a set of parallel arrays. a star's speed never
+    # changes, so stars are grouped by speed and each group is drawn by
+    # writing a prerendered stencil of pixel offsets straight into the
+    # target surface through surfarray instead of making one or two draw
+    # calls per star
+    def __init__(self, count, right, bottom):
+        self.right = right
+        self.bottom = bottom
+        self.x = np.random.randint(0, right, count).astype(np.float64)
+        self.y = np.random.randint(0, bottom, count).astype(np.float64)
+        self.speed = np.random.randint(1, 8, count)
         self.size = 1 + (self.speed / 4)
-        self.set_color()
 
-    def set_color(self):
-        # some portion of stars are white
-        if(random.randint(0, 100) < 50):
-            self.r = 255 * (self.speed/10)
-            self.g = 255 * (self.speed/10)
-            self.b = 255 * (self.speed/10)
+        # some portion of stars are white, the remaining stars are colored
+        # randomly. both are dimmed by their speed so slow stars look distant
+        white = np.random.randint(0, 101, count) < 50
+        rgb = np.random.randint(80, 255, (count, 3))
+        rgb[white] = 255
+        self.color = (rgb * (self.speed / 10)[:, None]).astype(np.uint8)
+
+        self.groups = [(speed, np.flatnonzero(self.speed == speed))
+                       for speed in range(1, 8)]
+        self.previous_x = self.x.copy()
+        self.current_x = None
+        self.stencils = {}
+        self.mapped_color = None
+        self.mapped_surface = None
+
+    def __len__(self):
+        return len(self.x)
+
+    def move(self, background_speed, speed_scale):
+        self.x -= self.speed * background_speed * speed_scale
+
+        # wrap stars that have left the screen back around to the right
+        wrapped = np.flatnonzero(
+            self.x < 0 - ((self.size + self.speed) * background_speed))
+        if len(wrapped):
+            reach = (self.size[wrapped] + self.speed[wrapped]).astype(int)
+            self.x[wrapped] = self.speed[wrapped] + self.right + \
+                (np.random.random(len(wrapped)) * reach).astype(int)
+            self.y[wrapped] = np.random.randint(0, self.bottom + 1, len(wrapped))
+
+    def save_positions(self):
+        self.previous_x[:] = self.x
+
+    def interpolate(self, alpha):
+        # move the stars part way back to where they were at the last tick.
+        # stars only move along x, and the ones that wrapped around since are
+        # left where they are
+        self.current_x = self.x
+        wrapped = self.x > self.previous_x
+        self.x = np.where(wrapped, self.x,
+                          self.previous_x + (self.x - self.previous_x) * alpha)
+
+    def restore(self):
+        self.x = self.current_x
+        self.current_x = None
+
+    def stencil(self, speed, streak_length=0):
+        # rasterise a star, plus its warp streak when streak_length is set,
+        # once and keep the pixel offsets from the star's centre along with
+        # how far the shape reaches in each direction
+        key = (speed, streak_length)
+        stencil = self.stencils.get(key)
+        if stencil is None:
+            size = 1 + speed / 4
+            pad = int(size) + 2
+            surface = pygame.Surface((streak_length + pad * 2 + 1, pad * 2 + 1))
+            pygame.draw.circle(surface, WHITE, (pad, pad), size)
 
-        # remaining stars are colored randomly
-        else:
-            self.r = random.randrange(80, 255) * self.speed/10
-            self.g = random.randrange(80, 255) * self.speed/10
-            self.b = random.randrange(80, 255) * self.speed/10
+            # draw a triangle pointing to the right
+            if streak_length:
+                pygame.draw.polygon(
+                    surface,
+                    WHITE,
+                    (
+                        (pad, pad + size + 1),
+                        (pad + streak_length, pad),
+                        (pad, pad - size)
+                    )
+                )
 
-    def move(self):
-        self.x -= self.speed * background_speed * fps_divisor()
+            ox, oy = np.nonzero(pygame.surfarray.array2d(surface))
+            ox -= pad
+            oy -= pad
+            stencil = (ox, oy, (ox.min(), oy.min(), ox.max(), oy.max()))
+            self.stencils[key] = stencil
+        return stencil
+
+    def map_colors(self, surface):
+        # convert the star colors to the target surface's pixel format
+        if self.mapped_surface is not surface:
+            self.mapped_color = np.array(
+                [surface.map_rgb(tuple(c)) for c in self.color.tolist()],
+                dtype=np.uint32)
+            self.mapped_surface = surface
+        return self.mapped_color
+
+    def draw(self, surface, background_speed):
+        colors = self.map_colors(surface)
+        surface_w, surface_h = surface.get_size()
+        pixels = pygame.surfarray.pixels2d(surface)
+
+        # view the locked pixels as one flat row so a stamp is a single
+        # fancy-index write. pitch is the row length including any padding
+        pitch = pixels.strides[1] // pixels.itemsize
+        flat = np.lib.stride_tricks.as_strided(
+            pixels,
+            shape=(pitch * (surface_h - 1) + surface_w,),
+            strides=(pixels.itemsize,)
+        )
 
-        if(self.x < 0 - ((self.size + self.speed) * background_speed)):
-            self.x = width + self.speed + \
-                random.randrange(0, int(self.size + self.speed))
-            self.y = random.randint(0, height)
+        for speed, stars in self.groups:
+            if len(stars) == 0:
+                continue
 
-    def draw(self):
-        pygame.draw.circle(
-            screen,
-            (self.r, self.g, self.b),
-            (self.x, self.y),
-            self.size
-        )
+            streak_length = 0
+            if background_speed > 1.1:
+                streak_length = int(background_speed * 2 * speed)
+            ox, oy, (left, top, right, bottom) = self.stencil(speed, streak_length)
 
-        # draw a a line from the center of the towards the right edge of the screen
-        if background_speed > 1.1:
-            # pygame.draw.line(
-            #     screen,
-            #     (self.r, self.g, self.b),
-            #     (self.x, self.y),
-            #     (self.x+background_speed*2*self.speed, self.y),
-            #     1
-            # )
+            x = self.x[stars].astype(np.intp)
+            y = self.y[stars].astype(np.intp)
+            c = colors[stars]
 
-            # draw a triangle pointing to the right
-            pygame.draw.polygon(
-                screen,
-                (self.r, self.g, self.b),
-                (
-                    (self.x, self.y+self.size+1),
-                    (self.x + background_speed * 2 * self.speed, self.y),
-                    (self.x, self.y-self.size)
-                )
-            )
+            # stars that are entirely on screen need no per pixel clipping
+            inside = (x + left >= 0) & (x + right < surface_w) & \
+                (y + top >= 0) & (y + bottom < surface_h)
+            flat[((y * pitch + x)[inside, None] + (oy * pitch + ox)).ravel()] = \
+                np.repeat(c[inside], len(ox))
+
+            edge = ~inside
+            if edge.any():
+                px = x[edge, None] + ox
+                py = y[edge, None] + oy
+                visible = (px >= 0) & (px < surface_w) & (py >= 0) & (py < surface_h)
+                pixels[px[visible], py[visible]] = \
+                    np.broadcast_to(c[edge, None], visible.shape)[visible]
+
+        # release the lock on the surface so it can be blit again
+        del flat
+        del pixels
 
 
 def tint(surf, r, g, b):
@@ -406,25 +619,17 @@ class Ship:
         self.vy = 0
         self.color_key = color_key
         self.scale = scale
-        self.sprite = load_image(sprite, x, y, w, h, color_key, scale)
+        self.set_asset(load_sprite(sprite, x, y, w, h, color_key, scale))
         self.hp = 300
         self.max_hp = 300
         self.level = 1
         self.weapon_level = 1
         self.defense_level = 0
         self.name = ""
-        self.mask = pygame.mask.from_surface(self.sprite)
         self.type = type
-        self.base_y = None
-        self.sinusoid_speed = 200
         self.frame_last_hit = 0
         self.weapons = []
 
-        # create the alpha transparency mask for the ship
-        self.sprite_damaged = reddening(self.sprite)
-        if(self.color_key is not None):
-            self.sprite_damaged.set_colorkey(self.color_key)
-
         if self.w == None:
             self.w = self.sprite.get_width() / self.scale
 
@@ -437,13 +642,6 @@ class Ship:
         if self.type == MOB_TYPE_BOSS or self.type == MOB_TYPE_PLAYER:
             self.y += self.vy * fps_divisor()
 
-        if self.type == MOB_TYPE_BASIC:
-            if self.base_y is None:
-                self.base_y = self.y
-
-            # move the y along a sinusoidal path
-            self.y = self.base_y + math.sin(self.x / 100) * self.sinusoid_speed
-
         edge_hit = False
 
         if edge_bound:
@@ -463,19 +661,27 @@ class Ship:
 
         return edge_hit
 
+    def set_asset(self, asset, flip_x=False, flip_y=False):
+        self.asset = asset
+        self.flipped_x = flip_x
+        self.flipped_y = flip_y
+        self.use_orientation()
+
+    def use_orientation(self):
+        # pick up the sprite, red tinted damaged sprite, collision mask and
+        # solid bounding box for the way the ship is facing
+        orientation = self.asset.orientation(self.flipped_x, self.flipped_y)
+        self.sprite = orientation.image
+        self.sprite_damaged = orientation.damaged
+        self.mask = orientation.mask
+        self.solid_rect = orientation.rect
+
     def change_sprite(self, sprite, x, y, w, h, color_key=None, scale=1):
         self.w = w
         self.h = h
         self.scale = scale
         self.color_key = color_key
-        self.sprite = load_image(sprite, x, y, w, h, color_key, scale)
-        self.sprite_damaged = reddening(self.sprite)
-
-        if(self.color_key is not None):
-            self.sprite.set_colorkey(self.color_key)
-            self.sprite_damaged.set_colorkey(self.color_key)
-
-        # create the alpha transparency mask for the ship
+        self.set_asset(load_sprite(sprite, x, y, w, h, color_key, scale))
 
     def draw(self):
         if frame_counter - self.frame_last_hit <= 1:
@@ -484,20 +690,12 @@ class Ship:
             screen.blit(self.sprite, (self.x, self.y))
 
     def flip_h(self):
-        self.sprite = pygame.transform.flip(self.sprite, True, False)
-        self.sprite_damaged = pygame.transform.flip(
-            self.sprite_damaged, True, False)
-        if(self.color_key is not None):
-            self.sprite.set_colorkey(self.color_key)
-            self.sprite_damaged.set_colorkey(self.color_key)
+        self.flipped_x = not self.flipped_x
+        self.use_orientation()
 
     def flip_v(self):
-        self.sprite = pygame.transform.flip(self.sprite, False, True)
-        self.sprite_damaged = pygame.transform.flip(
-            self.sprite_damaged, False, True)
-        if(self.color_key is not None):
-            self.sprite.set_colorkey(self.color_key)
-            self.sprite_damaged.set_colorkey(self.color_key)
+        self.flipped_y = not self.flipped_y
+        self.use_orientation()
 
     def collide_mask(self, mask, x=0, y=0):
         offset = (int(self.x - x), int(self.y - y))
@@ -526,29 +724,6 @@ class Projectile:
         self.hit = False
         self.type = type
 
-    def move(self):
-
-        if self.hit:
-            self.vx = 0.95 * self.vx
-            self.vy = 0.95 * self.vy
-            if abs(self.vx) < 2 and abs(self.vy) < 2:
-                self.vx = 0
-                self.vy = 0
-                return True
-
-        if self.acceleration != 1.0:
-            if frame_counter % 2 == 0:
-                self.vx *= self.acceleration
-                self.vy *= self.acceleration
-
-        self.x += self.vx * fps_divisor()
-        self.y += self.vy * fps_divisor()
-
-        if(self.x < (0 - self.radius) or self.x > (width + self.radius) or self.y < (0 - self.radius) or self.y > (height + self.radius)):
-            return True
-        else:
-            return False
-
     def draw(self):
         if not self.hit:
 
@@ -565,55 +740,927 @@ class Projectile:
                                         (self.x, self.y), self.radius)
 
                     case ProjectileType.Meatball:
-                        self.blitRotateCenter(
-                            meatball,
-                            (self.x - meatball.get_width() / 2,
-                            self.y - meatball.get_height() / 2),
-                            frame_counter % 360
-                        )
+                        meatball_atlas.blit(
+                            screen, (self.x, self.y), sprite_angle())
                     case ProjectileType.Noodle:
-                        self.blitRotateCenter(
-                            noodle,
-                            (self.x - noodle.get_width() / 2,
-                            self.y - noodle.get_height() / 2),
-                            frame_counter % 360
-                        )
+                        noodle_atlas.blit(
+                            screen, (self.x, self.y), sprite_angle())
                     case ProjectileType.ForwardTorpedo:
                         angle = 180 if self.vx < 0 else 0 # if shot left, rotate 180 else 0
-                        self.blitRotateCenter(
-                            player_torpedo,
-                            (self.x - player_torpedo.get_width() / 2,
-                            self.y - player_torpedo.get_height() / 2),
-                            angle
-                        )
+                        player_torpedo_atlas.blit(
+                            screen, (self.x, self.y), angle)
                     case _:
                         pygame.draw.circle(screen, self.color,
                                         (self.x, self.y), self.radius)
         else:
             if(self.damage < 0):
                 # if my damage is negative (healing), draw a green value
-                text_damage_value = font_small.render(
-                    "+" + str(abs(self.damage)), True, GREEN)
+                text_damage_value = render_text(
+                    font_small, "+" + str(abs(self.damage)), GREEN)
 
             else:
                 # otherwise, draw my damage value normally
-                text_damage_value = font_small.render(
-                    str(self.damage), True, self.color)
+                text_damage_value = render_text(
+                    font_small, str(self.damage), self.color)
 
             screen.blit(text_damage_value, (self.x - text_damage_value.get_width() /
                         2, self.y - text_damage_value.get_height()/2))
 
-    def blitRotateCenter(self, image, topleft, angle):
 
-        rotated_image = pygame.transform.rotate(image, angle)
-        new_rect = rotated_image.get_rect(
-            center=image.get_rect(topleft=topleft).center)
+class RotationAtlas:
+    # an image prerendered at evenly spaced angles so spinning sprites can be
+    # drawn with a lookup and a blit instead of a rotate every frame. each
+    # angle is rendered the first time it is drawn and stored with the offset
+    # from the rotated image's centre to its top left corner
+    def __init__(self, image, steps=ROTATION_STEPS):
+        self.image = image
+        self.steps = steps
+        self.frames = [None] * self.steps
+        self.masks = [None] * self.steps
+
+        # no frame reaches further from the centre than half the diagonal
+        self.reach = math.ceil(math.hypot(*image.get_size()) / 2)
+
+    def step(self, angle):
+        return round(angle * self.steps / 360) % self.steps
+
+    def frame(self, angle):
+        step = self.step(angle)
+        frame = self.frames[step]
+        if frame is None:
+            rotated = pygame.transform.rotate(self.image, step * 360 / self.steps)
+            frame = (rotated, rotated.get_rect(center=(0, 0)).topleft)
+            self.frames[step] = frame
+        return frame
+
+    def mask(self, angle):
+        # the collision mask of a frame, built from the frame the first time
+        # it is needed and returned with the same offset
+        step = self.step(angle)
+        mask = self.masks[step]
+        if mask is None:
+            rotated, offset = self.frame(angle)
+            mask = (pygame.mask.from_surface(rotated), offset)
+            self.masks[step] = mask
+        return mask
+
+    def blit(self, surface, center, angle):
+        rotated, (ox, oy) = self.frame(angle)
+        surface.blit(rotated, (center[0] + ox, center[1] + oy))
+
+
+def blit_sequence(surface, sequence):
+    # pygame-ce has a faster blits that returns nothing
+    if hasattr(surface, 'fblits'):
+        surface.fblits(sequence)
+    else:
+        surface.blits(sequence, doreturn=False)
+
+
+class ProjectileRenderer:
+    # draws whole projectile pools with a single blits call. circles are
+    # prerendered once per (colour, radius, heal) and blit where
+    # pygame.draw.circle would have drawn them, sprites come from their
+    # rotation atlas and projectiles that have hit show their damage value,
+    # the same as Projectile.draw() but without a draw call per projectile
+    def __init__(self):
+        self.circles = {}
+
+    def circle(self, color, radius, heal):
+        key = (color, radius, heal)
+        circle = self.circles.get(key)
+        if circle is None:
+            fill = GREEN if heal else color
+            circle = pygame.Surface((radius * 2, radius * 2))
+            background = BLACK if fill != BLACK else WHITE
+            circle.fill(background)
+            pygame.draw.circle(circle, fill, (radius, radius), radius)
+            circle.set_colorkey(background, pygame.RLEACCEL)
+            self.circles[key] = circle
+        return circle
+
+    def prerender(self, circles):
+        # render the circles ahead of the fight rather than on first use
+        for color, radius, heal in circles:
+            self.circle(color, radius, heal)
+
+    def add_pool(self, pool, sequence):
+        n = pool.count
+        if n == 0:
+            return
+
+        xs = pool.x[:n].tolist()
+        ys = pool.y[:n].tolist()
+        vxs = pool.vx[:n].tolist()
+        damages = pool.damage[:n].tolist()
+        radii = pool.radius[:n].tolist()
+        types = pool.type[:n].tolist()
+        hits = pool.hit[:n].tolist()
+        colors = [tuple(color) for color in pool.color[:n].tolist()]
+
+        # every spinning sprite shows the same angle on a given frame
+        meatball, (meatball_x, meatball_y) = meatball_atlas.frame(sprite_angle())
+        noodle, (noodle_x, noodle_y) = noodle_atlas.frame(sprite_angle())
+
+        for i in range(n):
+            x = xs[i]
+            y = ys[i]
+            damage = damages[i]
+
+            if hits[i]:
+                if damage < 0:
+                    text = render_text(font_small, "+" + str(abs(damage)), GREEN)
+                else:
+                    text = render_text(font_small, str(damage), colors[i])
+                sequence.append((text, (x - text.get_width() / 2, y - text.get_height() / 2)))
+            elif damage < 0:
+                radius = radii[i]
+                sequence.append((self.circle(GREEN, radius, True), (int(x) - radius, int(y) - radius)))
+            else:
+                match types[i]:
+                    case ProjectileType.Meatball:
+                        sequence.append((meatball, (x + meatball_x, y + meatball_y)))
+                    case ProjectileType.Noodle:
+                        sequence.append((noodle, (x + noodle_x, y + noodle_y)))
+                    case ProjectileType.ForwardTorpedo:
+                        torpedo, (ox, oy) = player_torpedo_atlas.frame(180 if vxs[i] < 0 else 0)
+                        sequence.append((torpedo, (x + ox, y + oy)))
+                    case _:
+                        radius = radii[i]
+                        sequence.append((self.circle(colors[i], radius, False), (int(x) - radius, int(y) - radius)))
+
+    def draw(self, surface, pools):
+        sequence = []
+        for pool in pools:
+            self.add_pool(pool, sequence)
+        blit_sequence(surface, sequence)
+
+
+projectile_renderer = ProjectileRenderer()
+
+
+# how far projectiles drawn as a sprite reach from their centre, indexed by
+# projectile type. filled in by load_images()
+sprite_reach = np.zeros(8, dtype=np.int32)
+
+
+def _pool_field(name, cast):
+    # expose one column of a ProjectilePool as an attribute of PooledProjectile
+    def get(self):
+        return cast(getattr(self.pool, name)[self.index])
+
+    def set(self, value):
+        getattr(self.pool, name)[self.index] = value
+
+    return property(get, set)
+
+
+class PooledProjectile(Projectile):
+    # a view of one live slot in a ProjectilePool. reads and writes go straight
+    # through to the pool's arrays so collide() and draw() can keep treating
+    # projectiles as objects. only valid until the next ProjectilePool.step()
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+
+    x = _pool_field('x', float)
+    y = _pool_field('y', float)
+    vx = _pool_field('vx', float)
+    vy = _pool_field('vy', float)
+    damage = _pool_field('damage', int)
+    radius = _pool_field('radius', int)
+    acceleration = _pool_field('accel', float)
+    type = _pool_field('type', int)
+    hit = _pool_field('hit', bool)
+    color = _pool_field('color', lambda c: (int(c[0]), int(c[1]), int(c[2])))
+
+
+class ProjectilePool:
+    # struct-of-arrays storage for projectiles. slots [0, count) are live, the
+    # arrays double in size when full and dead slots are compacted away by
+    # step() so the live projectiles always stay packed at the front
+    FIELDS = (
+        ('x', np.float64, ()),
+        ('y', np.float64, ()),
+        ('vx', np.float64, ()),
+        ('vy', np.float64, ()),
+        ('damage', np.int32, ()),
+        ('radius', np.int32, ()),
+        ('accel', np.float64, ()),
+        ('type', np.int8, ()),
+        ('hit', np.bool_, ()),
+        ('color', np.uint8, (3,)),
+        ('previous_x', np.float64, ()),
+        ('previous_y', np.float64, ()),
+    )
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.capacity = 0
+        self.current = None
+        self.resize(capacity)
+
+    def resize(self, capacity):
+        for name, dtype, shape in self.FIELDS:
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield PooledProjectile(self, i)
+
+    def append(self, projectile: Projectile):
+        if self.count == self.capacity:
+            self.resize(self.capacity * 2)
+
+        i = self.count
+        self.x[i] = projectile.x
+        self.y[i] = projectile.y
+        self.vx[i] = projectile.vx
+        self.vy[i] = projectile.vy
+        self.damage[i] = projectile.damage
+        self.radius[i] = projectile.radius
+        self.accel[i] = projectile.acceleration
+        self.type[i] = projectile.type
+        self.hit[i] = projectile.hit
+        self.color[i] = projectile.color[:3]
+        self.previous_x[i] = projectile.x
+        self.previous_y[i] = projectile.y
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def extend(self, x, y, vx, vy, damage, color, radius, acceleration=1.0, type=ProjectileType.Circle):
+        # append many projectiles at once from arrays of positions and
+        # velocities, everything else is shared
+        n = len(x)
+        while self.count + n > self.capacity:
+            self.resize(self.capacity * 2)
+
+        added = slice(self.count, self.count + n)
+        self.x[added] = x
+        self.y[added] = y
+        self.vx[added] = vx
+        self.vy[added] = vy
+        self.damage[added] = damage
+        self.radius[added] = radius
+        self.accel[added] = acceleration
+        self.type[added] = type
+        self.hit[added] = False
+        self.color[added] = color[:3]
+        self.previous_x[added] = x
+        self.previous_y[added] = y
+        self.count += n
+
+    def reaches(self, indices):
+        # how far each of the given projectiles extends from its centre, as
+        # its radius or half the diagonal of its sprite
+        heal = self.damage[indices] < 0
+        sprite = np.where(heal, 0, sprite_reach[self.type[indices]])
+        return np.maximum(self.radius[indices], sprite)
+
+    def reach(self, indices):
+        # how far the furthest reaching of the given projectiles extends
+        if len(indices) == 0:
+            return 0
+        return int(self.reaches(indices).max())
+
+    def save_positions(self):
+        n = self.count
+        self.previous_x[:n] = self.x[:n]
+        self.previous_y[:n] = self.y[:n]
+
+    def interpolate(self, alpha):
+        # swap in positions part way between the last tick and this one
+        # while the projectiles are drawn
+        n = self.count
+        self.current = (self.x, self.y)
+        self.x = self.x.copy()
+        self.y = self.y.copy()
+        self.x[:n] = self.previous_x[:n] + (self.x[:n] - self.previous_x[:n]) * alpha
+        self.y[:n] = self.previous_y[:n] + (self.y[:n] - self.previous_y[:n]) * alpha
+
+    def restore(self):
+        self.x, self.y = self.current
+        self.current = None
+
+    def step(self, accelerate, speed, right, bottom):
+        # advance every live projectile at once. projectiles that have hit
+        # something coast to a stop and are dropped once they are slow enough,
+        # everything else is dropped once it leaves the play field
+        n = self.count
+        if n == 0:
+            return
+
+        x, y = self.x[:n], self.y[:n]
+        vx, vy = self.vx[:n], self.vy[:n]
+        hit = self.hit[:n]
+        radius = self.radius[:n]
+
+        # slow down by the same amount a second whatever the update rate
+        vx[hit] *= 0.95 ** speed
+        vy[hit] *= 0.95 ** speed
+        dead = hit & (np.abs(vx) < 2) & (np.abs(vy) < 2)
+
+        if accelerate:
+            vx *= self.accel[:n]
+            vy *= self.accel[:n]
+
+        x += vx * speed
+        y += vy * speed
+
+        dead |= (x < -radius) | (x > right + radius)
+        dead |= (y < -radius) | (y > bottom + radius)
+
+        if dead.any():
+            keep = np.flatnonzero(~dead)
+            for name, dtype, shape in self.FIELDS:
+                array = getattr(self, name)
+                array[:len(keep)] = array[keep]
+            self.count = len(keep)
+
+
+class SpatialHash:
+    # uniform grid broadphase over a ProjectilePool. rebuild() buckets every
+    # projectile that has not hit anything yet by the cell holding its centre,
+    # candidates() then returns only the projectiles in the cells a bounding
+    # box overlaps. the buckets are stored as one array sorted by cell so a
+    # row of cells is a single contiguous slice
+    def __init__(self, cell_size, right, bottom):
+        self.cell_size = cell_size
+        self.cols = int(right // cell_size) + 1
+        self.rows = int(bottom // cell_size) + 1
+        self.keys = np.empty(0, dtype=np.intp)
+        self.order = np.empty(0, dtype=np.intp)
+        self.reach = 0
+
+    def cell(self, x, y):
+        # projectiles slightly off the play field share the edge cells
+        cx = np.clip(x // self.cell_size, 0, self.cols - 1).astype(np.intp)
+        cy = np.clip(y // self.cell_size, 0, self.rows - 1).astype(np.intp)
+        return cx, cy
+
+    def rebuild(self, pool):
+        live = np.flatnonzero(~pool.hit[:pool.count])
+        cx, cy = self.cell(pool.x[live], pool.y[live])
+        keys = cy * self.cols + cx
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.order = live[order]
+        self.reach = pool.reach(live)
+
+    def candidates(self, left, top, right, bottom):
+        if len(self.order) == 0:
+            return self.order
+
+        # widen the box by the largest reach so projectiles centred in a
+        # neighbouring cell but overlapping the box are still found
+        (cx0, cx1), (cy0, cy1) = self.cell(
+            np.array([left - self.reach, right + self.reach]),
+            np.array([top - self.reach, bottom + self.reach]))
+
+        row_starts = np.arange(cy0, cy1 + 1) * self.cols
+        lo = np.searchsorted(self.keys, row_starts + cx0, 'left')
+        hi = np.searchsorted(self.keys, row_starts + cx1, 'right')
+        found = [self.order[a:b] for a, b in zip(lo, hi) if b > a]
+        if not found:
+            return self.order[:0]
+
+        # hand the projectiles back in the order they were fired
+        return np.sort(np.concatenate(found))
+
+    def hits(self, pool):
+        # the bucketed projectiles that have hit something since rebuild()
+        return self.order[pool.hit[self.order]]
+
+
+class SwarmKind:
+    # what every trash mob of one type shares: its sprite and damaged sprite
+    # flipped to face the player, the matching mask and the hp bar surfaces
+    def __init__(self, sprite):
+        orientation = load_sprite(*sprite).orientation(flip_x=True)
+        self.image = orientation.image
+        self.damaged = orientation.damaged
+        self.mask = orientation.mask
+        self.width, self.height = self.image.get_size()
+
+        self.bar = pygame.Surface((self.width, SWARM_BAR_HEIGHT))
+        self.bar.fill(YELLOW)
+        self.bar_fills = {}
+
+    def bar_fill(self, pixels):
+        # the blue part of the hp bar, one surface per width in pixels
+        fill = self.bar_fills.get(pixels)
+        if fill is None:
+            fill = pygame.Surface((pixels, SWARM_BAR_HEIGHT))
+            fill.fill(BLUE)
+            self.bar_fills[pixels] = fill
+        return fill
+
+
+class Swarm:
+    # struct-of-arrays storage for the trash mobs, kept packed like a
+    # ProjectilePool. mobs of one type share a SwarmKind, so a wave costs a
+    # few array writes rather than a Ship each, and moving, firing, colliding
+    # and drawing them all work on the whole swarm at once
+    FIELDS = (
+        ('x', np.float64),
+        ('y', np.float64),
+        ('base_y', np.float64),
+        ('vx', np.float64),
+        ('amplitude', np.float64),
+        ('hp', np.int64),
+        ('max_hp', np.int64),
+        ('kind', np.int32),
+        ('frame_last_hit', np.int64),
+        ('previous_x', np.float64),
+        ('previous_y', np.float64),
+    )
+
+    def __init__(self, capacity=64):
+        self.kinds = []
+        self.kind_indices = {}
+        self.widths = np.zeros(0)
+        self.heights = np.zeros(0)
+        self.count = 0
+        self.capacity = 0
+        self.current = None
+        self.resize(capacity)
+
+    def resize(self, capacity):
+        for name, dtype in self.FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def add_kind(self, sprite):
+        # the index of the SwarmKind for a load_sprite argument tuple, made
+        # on first use
+        index = self.kind_indices.get(sprite)
+        if index is None:
+            index = len(self.kinds)
+            self.kinds.append(SwarmKind(sprite))
+            self.kind_indices[sprite] = index
+            self.widths = np.array([kind.width for kind in self.kinds], dtype=np.float64)
+            self.heights = np.array([kind.height for kind in self.kinds], dtype=np.float64)
+        return index
+
+    def spawn(self, sprite, xs, y, vx, hp, amplitude):
+        # add a wave of mobs of one kind flying along the same path
+        kind = self.add_kind(sprite)
+        n = len(xs)
+        while self.count + n > self.capacity:
+            self.resize(self.capacity * 2)
+
+        wave = slice(self.count, self.count + n)
+        self.x[wave] = xs
+        self.y[wave] = y
+        self.base_y[wave] = y
+        self.vx[wave] = vx
+        self.amplitude[wave] = amplitude
+        self.hp[wave] = hp
+        self.max_hp[wave] = hp
+        self.kind[wave] = kind
+        self.frame_last_hit[wave] = 0
+        self.previous_x[wave] = xs
+        self.previous_y[wave] = y
+        self.count += n
+
+    def keep(self, alive):
+        keep = np.flatnonzero(alive)
+        for name, dtype in self.FIELDS:
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.count = len(keep)
+
+    def bounds(self):
+        # left, top, right and bottom of every mob
+        n = self.count
+        kind = self.kind[:n]
+        x, y = self.x[:n], self.y[:n]
+        return x, y, x + self.widths[kind], y + self.heights[kind]
 
-        screen.blit(rotated_image, new_rect)
+    def move(self):
+        # fly left along a sine wave and drop the mobs that leave the screen
+        n = self.count
+        if n == 0:
+            return
+
+        x = self.x[:n]
+        x += self.vx[:n] * fps_divisor()
+        self.y[:n] = self.base_y[:n] + np.sin(x / 100) * self.amplitude[:n]
+
+        off_screen = x < -self.widths[self.kind[:n]]
+        if off_screen.any():
+            self.keep(~off_screen)
+
+    def fire(self, pool, target, damage, color, radius, speed, ox=0, oy=0):
+        # one quadrant spray shot from every mob at once, the same shots
+        # fire_projectile() would make in mode 2
+        n = self.count
+        if n == 0:
+            return
+
+        left, top, right, bottom = self.bounds()
+        source_x = (left + right) / 2
+        source_y = (top + bottom) / 2
+        target_x = target.x + target.w * target.scale / 2
+        target_y = target.y + target.h * target.scale / 2
+
+        # draw the random numbers in the same order fire_projectile would
+        spray = np.array([random.random() for _ in range(n)])
+        vx = np.where(source_x > target_x, spray * -speed, spray * speed)
+        vy = np.where(source_y > target_y, np.abs(vx) - speed, speed - np.abs(vx))
+
+        short = np.abs(vx) + np.abs(vy) < speed
+        while short.any():
+            vx[short] *= 2
+            vy[short] *= 2
+            short = np.abs(vx) + np.abs(vy) < speed
+
+        pool.extend(source_x + ox, source_y + oy, vx, vy, damage, color, radius)
+
+    def collide(self, pool, grid):
+        # find the projectiles near the swarm with the pool's SpatialHash,
+        # test those against every mob at once by bounding box, then only the
+        # pairs that are close by mask. returns the mobs hit as (index,
+        # damage) in the order they were hit
+        hits = []
+        n = self.count
+        if n == 0:
+            return hits
+
+        left, top, right, bottom = self.bounds()
+        indices = grid.candidates(left.min(), top.min(), right.max(), bottom.max())
+        if len(indices) == 0:
+            return hits
+
+        px = pool.x[indices]
+        py = pool.y[indices]
+        reach = pool.reaches(indices)
+
+        dx = np.maximum(np.maximum(left[:, None] - px, 0), px - right[:, None])
+        dy = np.maximum(np.maximum(top[:, None] - py, 0), py - bottom[:, None])
+        mobs, near = np.nonzero(dx * dx + dy * dy <= reach * reach)
+        if len(mobs) == 0:
+            return hits
+
+        candidates = indices[near]
+        masks = projectile_masks(pool, candidates)
+        xs = self.x[:n].tolist()
+        ys = self.y[:n].tolist()
+        kinds = self.kind[:n].tolist()
+
+        dead = np.zeros(n, dtype=np.bool_)
+        for mob, index, (mask, mx, my) in zip(mobs.tolist(), candidates.tolist(), masks):
+            if dead[mob]:
+                continue
+
+            kind = self.kinds[kinds[mob]]
+            if mask.overlap(kind.mask, (int(xs[mob] - mx), int(ys[mob] - my))) is None:
+                continue
+
+            damage = int(pool.damage[index])
+            self.hp[mob] -= damage
+            self.frame_last_hit[mob] = frame_counter
+            pool.hit[index] = True
+            hits.append((mob, damage))
+            if self.hp[mob] <= 0:
+                dead[mob] = True
+
+        if dead.any():
+            self.keep(~dead)
+        return hits
+
+    def save_positions(self):
+        n = self.count
+        self.previous_x[:n] = self.x[:n]
+        self.previous_y[:n] = self.y[:n]
+
+    def interpolate(self, alpha):
+        # like ProjectilePool.interpolate, except mobs that moved further
+        # than INTERPOLATION_JUMP are drawn where they are
+        n = self.count
+        self.current = (self.x, self.y)
+        self.x = self.x.copy()
+        self.y = self.y.copy()
+
+        x, y = self.x[:n], self.y[:n]
+        px, py = self.previous_x[:n], self.previous_y[:n]
+        slide = (np.abs(x - px) <= INTERPOLATION_JUMP) & (np.abs(y - py) <= INTERPOLATION_JUMP)
+        x[slide] = px[slide] + (x[slide] - px[slide]) * alpha
+        y[slide] = py[slide] + (y[slide] - py[slide]) * alpha
+
+    def restore(self):
+        self.x, self.y = self.current
+        self.current = None
+
+    def draw(self, surface):
+        n = self.count
+        damaged = (frame_counter - self.frame_last_hit[:n] <= 1).tolist()
+        sequence = []
+        for kind, hurt, x, y in zip(self.kind[:n].tolist(), damaged,
+                                    self.x[:n].tolist(), self.y[:n].tolist()):
+            kind = self.kinds[kind]
+            sequence.append((kind.damaged if hurt else kind.image, (x, y)))
+        blit_sequence(surface, sequence)
+
+    def draw_hp_bars(self, surface):
+        # a yellow bar under each mob, filled blue with its remaining hp
+        n = self.count
+        if n == 0:
+            return
+
+        left, top, right, bottom = self.bounds()
+        health = np.clip(self.hp[:n], 0, self.max_hp[:n]) / self.max_hp[:n]
+        fills = ((right - left) * health).astype(np.int64).tolist()
+
+        sequence = []
+        for kind, x, y, fill in zip(self.kind[:n].tolist(), left.tolist(), bottom.tolist(), fills):
+            kind = self.kinds[kind]
+            sequence.append((kind.bar, (x, y)))
+            if fill > 0:
+                sequence.append((kind.bar_fill(fill), (x, y)))
+        blit_sequence(surface, sequence)
+
+
+swarm = Swarm()
+
+
+class SpriteOrientation:
+    # a SpriteAsset flipped one way round: the image and damaged image
+    # flipped to match, the mask of the flipped image and the box around
+    # its solid pixels
+    def __init__(self, asset, flip_x=False, flip_y=False):
+        if not flip_x and not flip_y:
+            self.image = asset.image
+            self.damaged = asset.get_damaged()
+            self.mask = asset.get_mask()
+        else:
+            self.image = pygame.transform.flip(asset.image, flip_x, flip_y)
+            self.damaged = pygame.transform.flip(asset.get_damaged(), flip_x, flip_y)
+            if(asset.color_key is not None):
+                self.image.set_colorkey(asset.color_key)
+                self.damaged.set_colorkey(asset.color_key)
+            self.mask = pygame.mask.from_surface(self.image)
+
+        rects = self.mask.get_bounding_rects()
+        self.rect = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+
+
+def bytesize(part):
+    # memory held by a surface or a mask, which packs a bit per pixel
+    w, h = part.get_size()
+    if isinstance(part, pygame.mask.Mask):
+        return w * h // 8
+    return w * h * part.get_bytesize()
+
+
+class SpriteAsset:
+    # a decoded, cropped and scaled image along with the red damaged variant
+    # and collision mask ships need. the extras are only built on first use
+    # so plain images such as the planets never pay for them
+    def __init__(self, image, color_key=None, source=None):
+        self.image = image
+        self.color_key = color_key
+        self.source = source
+        self.damaged = None
+        self.mask = None
+        self.orientations = {}
+
+    def get_damaged(self):
+        if self.damaged is None:
+            if self.source is None:
+                self.damaged = reddening(self.image)
+            else:
+                self.damaged = prepared_image(
+                    self.source, 'damaged', lambda: reddening(self.image))
+            if(self.color_key is not None):
+                self.damaged.set_colorkey(self.color_key)
+        return self.damaged
+
+    def get_mask(self):
+        if self.mask is None:
+            self.mask = pygame.mask.from_surface(self.image)
+        return self.mask
+
+    def orientation(self, flip_x=False, flip_y=False):
+        # everything a ship needs to face the given way, made once per way
+        # round and shared by every ship using this asset
+        key = (flip_x, flip_y)
+        orientation = self.orientations.get(key)
+        if orientation is None:
+            orientation = SpriteOrientation(self, flip_x, flip_y)
+            self.orientations[key] = orientation
+        return orientation
+
+    def get_bytesize(self):
+        # the unflipped orientation shares the asset's own surfaces and mask,
+        # every other one holds flipped copies of its own
+        parts = [self.image, self.damaged, self.mask]
+        for key, orientation in self.orientations.items():
+            if key != (False, False):
+                parts += [orientation.image, orientation.damaged, orientation.mask]
+        return sum(bytesize(part) for part in parts if part is not None)
+
+
+class LRUCache:
+    # least recently used cache that evicts once the total size of its
+    # entries goes over max_size. sizeof measures an entry and defaults to
+    # counting entries
+    def __init__(self, max_size, sizeof=None):
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def evict(self):
+        # drop the least recently used entries until we fit, but always keep
+        # the newest one even if it is larger than the whole budget. sprite
+        # assets grow as their extras are built after they are cached, so
+        # every entry is measured once here and the total kept as they go
+        size = self.get_size()
+        while len(self.entries) > 1 and size > self.max_size:
+            key, value = self.entries.popitem(last=False)
+            size -= self.sizeof(value)
+
+    def get_size(self):
+        return sum(self.sizeof(value) for value in self.entries.values())
+
+    def clear(self):
+        self.entries.clear()
+
+
+# process wide cache of SpriteAssets keyed by (path, rect, scale, color key).
+# the surfaces are shared by everyone that loads the same image so they must
+# never be modified in place
+asset_cache = LRUCache(ASSET_CACHE_BYTES, SpriteAsset.get_bytesize)
+
+
+def load_sprite(filename, x: int | None = None, y: int | None = None, w: int | None = None, h: int | None = None, color_key=None, scale=1):
+    key = (filename, x, y, w, h, color_key, scale)
+    asset = asset_cache.get(key)
+    if asset is None:
+        asset = decode_sprite(filename, x, y, w, h, color_key, scale)
+        asset_cache.put(key, asset)
+    return asset
+
+
+def decode_sprite(filename, x: int | None = None, y: int | None = None, w: int | None = None, h: int | None = None, color_key=None, scale=1):
+    return SpriteAsset(
+        decode_image(filename, x, y, w, h, color_key, scale),
+        color_key,
+        (filename, x, y, w, h, scale)
+    )
 
 
 def load_image(filename, x: int | None = None, y: int | None = None, w: int | None = None, h: int | None = None, color_key=None, scale=1):
-    image = pygame.image.load(filename).convert_alpha()
+    return load_sprite(filename, x, y, w, h, color_key, scale).image
+
+
+# (size, modification time) and sha1 of every source image seen this run
+source_digests = {}
+
+# every baked file read or written this run, so --bake can remove the rest
+baked_paths = set()
+
+# every (source, variant) image prepared this run, in the order they were
+# first asked for, so --bake knows what to pack into the asset bundle
+prepared_images = {}
+
+
+def source_digest(filename):
+    # hash the source file, only reading it again once it has changed
+    stat = os.stat(filename)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    known = source_digests.get(filename)
+    if known is None or known[0] != stamp:
+        with open(filename, 'rb') as f:
+            known = (stamp, hashlib.sha1(f.read()).hexdigest())
+        source_digests[filename] = known
+    return known[1]
+
+
+def baked_path(filename, x, y, w, h, scale, variant):
+    # the baked file for one variant of a cropped and scaled source image. a
+    # changed source hashes differently so it is simply baked again
+    key = repr((source_digest(filename), x, y, w, h, scale, variant))
+    path = os.path.join(BAKED_ASSET_DIR, hashlib.sha1(key.encode()).hexdigest() + '.rgba')
+    baked_paths.add(path)
+    return path
+
+
+def read_baked(path):
+    # a baked file is its width and height followed by raw rgba pixels.
+    # returns the surface, not yet converted to the display format, or None
+    # when the file is missing or not whole
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < 8:
+        return None
+    w, h = struct.unpack('<II', data[:8])
+    if len(data) != 8 + w * h * 4:
+        return None
+
+    return pygame.image.frombuffer(memoryview(data)[8:], (w, h), 'RGBA')
+
+
+def write_baked(path, image):
+    # write to a temporary file first so a reader never sees half a file
+    try:
+        os.makedirs(BAKED_ASSET_DIR, exist_ok=True)
+        handle, temp = tempfile.mkstemp(dir=BAKED_ASSET_DIR)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(struct.pack('<II', image.get_width(), image.get_height()))
+            f.write(pygame.image.tobytes(image, 'RGBA'))
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    except OSError as error:
+        print("Unable to bake " + path + ": " + str(error))
+
+
+def fetch_image(source, variant):
+    # one variant of a cropped and scaled source image, where source is
+    # (filename, x, y, w, h, scale), from the asset bundle or the baked cache.
+    # returns None when neither has it, or the surface still to be converted
+    # to the display format. safe to call from a worker thread
+    prepared_images[(source, variant)] = True
+
+    if asset_bundle is not None:
+        image = asset_bundle.image(source, variant)
+        if image is not None:
+            return image
+
+    if BAKE_ASSETS:
+        return read_baked(baked_path(*source, variant))
+    return None
+
+
+def prepared_image(source, variant, build):
+    # the prepared copy of an image when there is one, otherwise build it
+    # and bake it for next time
+    image = fetch_image(source, variant)
+    if image is not None:
+        return image.convert_alpha()
+
+    image = build()
+    if BAKE_ASSETS:
+        write_baked(baked_path(*source, variant), image)
+    return image
+
+
+# decode, crop and scale an image, from a prepared copy when there is one
+def decode_image(filename, x: int | None = None, y: int | None = None, w: int | None = None, h: int | None = None, color_key=None, scale=1):
+    image = prepared_image(
+        (filename, x, y, w, h, scale),
+        'image',
+        lambda: decode_source_image(filename, x, y, w, h, color_key, scale)
+    )
+    if(color_key is not None):
+        image.set_colorkey(color_key)
+    return image
+
+
+# decode, crop and scale an image from its source file
+def decode_source_image(filename, x: int | None = None, y: int | None = None, w: int | None = None, h: int | None = None, color_key=None, scale=1):
+    return finish_source_image(pygame.image.load(filename), x, y, w, h, color_key, scale)
+
+
+# convert a freshly decoded image to the display format, crop and scale it
+def finish_source_image(image, x: int | None = None, y: int | None = None, w: int | None = None, h: int | None = None, color_key=None, scale=1):
+    image = image.convert_alpha()
 
     if x is None:
         x = 0
@@ -631,26 +1678,415 @@ def load_image(filename, x: int | None = None, y: int | None = None, w: int | No
     return image
 
 
+def source_stamp(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class AssetBundle:
+    # one memory mapped file of decoded images, raw sound samples and font
+    # files so startup does not have to open and decode dozens of files. the
+    # file is the magic, the length and crc32 of a json table of contents,
+    # the table itself and then the entries. the table has each entry's
+    # offset, length and crc32, along with the size and modification time of
+    # the file it came from so an entry is ignored once its source changes
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = 16
+        magic = self.map[:8]
+        toc_length, toc_crc = struct.unpack('<II', self.map[8:header])
+        toc = self.map[header:header + toc_length]
+        if magic != BUNDLE_MAGIC or len(toc) != toc_length or zlib.crc32(toc) != toc_crc:
+            raise ValueError("not a valid asset bundle")
+
+        toc = json.loads(toc)
+        self.entries = toc['entries']
+        self.mixer = toc['mixer']
+        self.data = memoryview(self.map)[header + toc_length:]
+        self.checked = set()
+        self.stale = 0
+
+    def entry(self, key, filename):
+        # the entry's bytes, or None when the bundle does not have it or it
+        # is out of date. the crc is checked the first time it is read
+        entry = self.entries.get(key)
+        if entry is None:
+            return None, None
+
+        if entry['source'] != source_stamp(filename):
+            self.stale += 1
+            if self.stale == 1:
+                print("Asset bundle is out of date, run main.py --bake to rebuild it")
+            return None, None
+
+        data = self.data[entry['offset']:entry['offset'] + entry['length']]
+        if key not in self.checked:
+            if zlib.crc32(data) != entry['crc']:
+                print("Asset bundle entry " + key + " is corrupt")
+                return None, None
+            self.checked.add(key)
+        return entry, data
+
+    def image(self, source, variant):
+        entry, data = self.entry(repr((source, variant)), source[0])
+        if entry is None:
+            return None
+        return pygame.image.frombuffer(data, entry['size'], 'RGBA')
+
+    def sound(self, filename):
+        # the samples are only any use to a mixer set up the same way
+        if self.mixer != list(pygame.mixer.get_init() or ()):
+            return None
+        entry, data = self.entry(filename, filename)
+        if entry is None:
+            return None
+        return pygame.mixer.Sound(buffer=data)
+
+    def file(self, filename):
+        entry, data = self.entry(filename, filename)
+        if entry is None:
+            return None
+        return io.BytesIO(data)
+
+
+asset_bundle = None
+
+
+def open_asset_bundle():
+    global asset_bundle
+
+    asset_bundle = None
+    if not os.path.isfile(ASSET_BUNDLE):
+        return
+
+    try:
+        asset_bundle = AssetBundle(ASSET_BUNDLE)
+        print("Opened asset bundle with " + str(len(asset_bundle.entries)) + " entries.")
+    except (OSError, ValueError, KeyError, struct.error) as error:
+        print("Unable to open asset bundle: " + str(error))
+
+
+def write_asset_bundle(path):
+    # pack every baked image prepared so far, every sound effect and the font
+    entries = {}
+    blobs = []
+    offset = 0
+
+    def add(key, filename, data, **extra):
+        nonlocal offset
+        entries[key] = dict(
+            offset=offset,
+            length=len(data),
+            crc=zlib.crc32(data),
+            source=source_stamp(filename),
+            **extra
+        )
+        blobs.append(data)
+        offset += len(data)
+
+    for source, variant in list(prepared_images):
+        image = read_baked(baked_path(*source, variant))
+        if image is not None:
+            add(repr((source, variant)), source[0],
+                pygame.image.tobytes(image, 'RGBA'), size=image.get_size())
+
+    mixer = list(pygame.mixer.get_init() or ())
+    if mixer:
+        for filename in SOUND_FILES.values():
+            add(filename, filename, pygame.mixer.Sound(filename).get_raw())
+
+    with open(FONT_FILE, 'rb') as f:
+        add(FONT_FILE, FONT_FILE, f.read())
+
+    toc = json.dumps({'entries': entries, 'mixer': mixer}).encode()
+
+    handle, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(handle, 'wb') as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack('<II', len(toc), zlib.crc32(toc)))
+        f.write(toc)
+        for blob in blobs:
+            f.write(blob)
+    os.chmod(temp, 0o644)
+    os.replace(temp, path)
+
+    print("Wrote " + path + " with " + str(len(entries)) + " entries, " +
+          "{0:.1f}".format((offset + len(toc)) / 1024 / 1024) + " MB")
+
+
+# sounds and music already loaded by an AssetLoader, keyed by filename
+loaded_sounds = {}
+loaded_music = {}
+
+
+def read_sound(filename):
+    # returns the sound and where it came from
+    if asset_bundle is not None:
+        sound = asset_bundle.sound(filename)
+        if sound is not None:
+            return sound, 'bundle'
+    return pygame.mixer.Sound(filename), 'file'
+
+
+def load_sound(filename):
+    sound = loaded_sounds.get(filename)
+    if sound is None:
+        sound = read_sound(filename)[0]
+    return sound
+
+
+def read_asset(kind, args, damaged):
+    # the part of loading an asset that can run on a worker thread: reading
+    # and decoding it. returns the result, where it came from and how long
+    # it took
+    start = time.perf_counter()
+
+    if kind == 'sound':
+        result, origin = read_sound(args)
+    elif kind == 'music':
+        with open(args, 'rb') as f:
+            result = f.read()
+        origin = 'file'
+    else:
+        filename, x, y, w, h, color_key, scale = args
+        source = (filename, x, y, w, h, scale)
+        image = fetch_image(source, 'image')
+        origin = 'prepared'
+        if image is None:
+            image = pygame.image.load(filename)
+            origin = 'source'
+        result = (image, fetch_image(source, 'damaged') if damaged else None)
+
+    return result, origin, time.perf_counter() - start
+
+
+def finish_sprite(args, image, damaged_image, origin):
+    # turn a sprite read by read_asset into a SpriteAsset. converting needs
+    # the display so this must run on the main thread
+    filename, x, y, w, h, color_key, scale = args
+    if origin == 'source':
+        image = finish_source_image(image, x, y, w, h, color_key, scale)
+        if BAKE_ASSETS:
+            write_baked(baked_path(filename, x, y, w, h, scale, 'image'), image)
+    else:
+        image = image.convert_alpha()
+        if(color_key is not None):
+            image.set_colorkey(color_key)
+
+    asset = SpriteAsset(image, color_key, (filename, x, y, w, h, scale))
+    if damaged_image is not None:
+        asset.damaged = damaged_image.convert_alpha()
+        if(color_key is not None):
+            asset.damaged.set_colorkey(color_key)
+    return asset
+
+
+class AssetLoader:
+    # loads a batch of sprites and sounds with the slow part, reading and
+    # decoding files, spread over a thread pool. images are finished on the
+    # main thread since converting them needs the display, then go into the
+    # asset cache where load_sprite finds them. sounds go into loaded_sounds
+    # and music files into loaded_music
+    def __init__(self, workers=ASSET_LOADER_WORKERS):
+        self.workers = workers
+        self.jobs = []
+        self.pending = []
+        self.executor = None
+        self.timings = []
+        self.start_time = None
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def is_pending(self, kind, args):
+        return any(job[0] == kind and job[1] == args for job, future in self.pending)
+
+    def add_sprite(self, filename, x=None, y=None, w=None, h=None, color_key=None, scale=1, damaged=False):
+        self.jobs.append(('sprite', (filename, x, y, w, h, color_key, scale), damaged))
+
+    def add_sound(self, filename):
+        self.jobs.append(('sound', filename, False))
+
+    def add_music(self, filename):
+        self.jobs.append(('music', filename, False))
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='asset-loader')
+        self.pending = [(job, self.executor.submit(read_asset, *job)) for job in self.jobs]
+
+    def poll(self, budget=None):
+        # finish decoded assets in the order they were added until one is not
+        # ready or the budget in seconds runs out, or wait for every one when
+        # there is no budget. returns True once everything is loaded
+        start = time.perf_counter()
+        while self.pending:
+            job, future = self.pending[0]
+            if budget is not None:
+                if not future.done() or time.perf_counter() - start > budget:
+                    return False
+            self.pending.pop(0)
+            self.finish(job, *future.result())
+
+        self.executor.shutdown()
+        return True
+
+    def run(self):
+        self.start()
+        self.poll()
+        self.report()
+
+    def cancel(self):
+        # drop the assets that have not started loading and wait for the
+        # rest, so no worker is left decoding after pygame quits
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        self.pending = []
+
+    def finish(self, job, result, origin, seconds):
+        start = time.perf_counter()
+        kind, args, damaged = job
+
+        if kind == 'sound':
+            loaded_sounds[args] = result
+            name = args
+        elif kind == 'music':
+            loaded_music[args] = result
+            name = args
+        else:
+            filename, x, y, w, h, color_key, scale = args
+            asset_cache.put(args, finish_sprite(args, *result, origin))
+            name = filename if scale == 1 else filename + " x" + str(scale)
+
+        self.timings.append((name, origin, seconds + time.perf_counter() - start))
+
+    def report(self, detailed=True):
+        # the slowest assets first. an asset's time is how long it took to
+        # read, decode and finish, which overlaps with the others
+        if detailed:
+            for name, origin, seconds in sorted(self.timings, key=lambda timing: -timing[2]):
+                print("  " + "{0:7.1f}".format(seconds * 1000) + " ms  " + origin.ljust(9) + name)
+        print("Loaded " + str(len(self.timings)) + " assets in " +
+              "{0:.1f}".format((time.perf_counter() - self.start_time) * 1000) +
+              " ms on " + str(self.workers) + " threads.")
+
+
+def queue_startup_assets(loader):
+    # everything up to and including the title screen
+    for name, filename in SOUND_FILES.items():
+        if name not in STREAMED_SOUNDS:
+            loader.add_sound(filename)
+
+    for name in PLANET_IMAGES:
+        loader.add_sprite('sprites/' + name + '.png')
+
+    for sprite in [MEATBALL_SPRITE, NOODLE_SPRITE, CONTROLS_SPRITE, PLAYER_TORPEDO_SPRITE]:
+        loader.add_sprite(*sprite)
+
+    # ships also need their damaged sprite, including the first boss
+    name, sprite, flip = boss_design(1)
+    for ship in [PLAYER_SPRITE, PLACEHOLDER_BOSS_SPRITE, sprite]:
+        loader.add_sprite(*ship, damaged=True)
+
+
+def queue_streamed_assets(loader):
+    # everything the title screen can do without, roughly in the order the
+    # game needs it
+    for name in STREAMED_SOUNDS:
+        loader.add_sound(SOUND_FILES[name])
+
+    loader.add_music(next_track)
+
+    for level in range(2, 16):
+        name, sprite, flip = boss_design(level)
+        loader.add_sprite(*sprite, damaged=True)
+
+    for sprite in TRASH_SPRITES:
+        loader.add_sprite(*sprite, damaged=True)
+
+
+def load_assets():
+    print("Loading assets...")
+    loader = AssetLoader()
+    queue_startup_assets(loader)
+    loader.run()
+
+
+def loading_steps():
+    # a generator that loads everything the title screen needs a few
+    # milliseconds at a time. it yields how far along it is after each step
+    # so the main loop can draw the loading screen and handle events
+    print("Loading assets...")
+    loader = AssetLoader()
+    queue_startup_assets(loader)
+
+    # sounds, images and game objects are the last few steps
+    steps = len(loader) + 3
+    try:
+        loader.start()
+        while not loader.poll(LOADING_FRAME_BUDGET):
+            yield len(loader.timings) / steps
+        loader.report()
+    finally:
+        loader.cancel()
+
+    load_sounds()
+    yield (steps - 2) / steps
+    load_images()
+    yield (steps - 1) / steps
+    create_game_objects()
+    yield 1.0
+
+
+def start_streaming():
+    # start loading the assets the title screen does not need
+    global streaming, next_track
+
+    next_track = random.choice(JUKEBOX)
+    streaming = AssetLoader()
+    queue_streamed_assets(streaming)
+    streaming.start()
+
+
+def stream_assets():
+    # finish a few streamed assets each frame until they are all in
+    global streaming
+
+    if streaming is not None and streaming.poll(STREAMING_FRAME_BUDGET):
+        streaming.report(detailed=False)
+        streaming = None
+
+
+def get_sfx(name):
+    # streamed sounds that have not arrived yet are loaded on the spot
+    if name not in sfx:
+        sfx[name] = load_sound(SOUND_FILES[name])
+        sfx[name].set_volume(volume / 100)
+    return sfx[name]
+
+
+def load_font(filename, size):
+    data = asset_bundle.file(filename) if asset_bundle is not None else None
+    return pygame.font.Font(data if data is not None else filename, size)
+
+
 def move_starfield():
     for so in space_objects:
         so.move()
 
-    for star in stars:
-        star.move()
+    starfield.move(background_speed, fps_divisor())
 
 
 def move_projectiles():
-    global player_projectiles, enemy
+    # accelerating projectiles speed up 30 times a second
+    updates = tick if simulating else frame_counter
+    accelerate = updates % (2 * fps_scaler()) == 0
 
-    # handle player projectiles
-    for projectile in player_projectiles:
-        if(projectile.move()):
-            player_projectiles.remove(projectile)
-
-    # handle boss projectiles
-    for projectile in boss_projectiles:
-        if(projectile.move()):
-            boss_projectiles.remove(projectile)
+    player_projectiles.step(accelerate, fps_divisor(), width, height)
+    boss_projectiles.step(accelerate, fps_divisor(), width, height)
 
 
 def handle_game_inputs():
@@ -661,7 +2097,7 @@ def handle_game_inputs():
     player.vy = 0
 
     # handle key presses
-    keys = pygame.key.get_pressed()
+    keys = get_pressed_keys()
 
     joy_shoot = False
     joy_deflect = False
@@ -752,6 +2188,8 @@ def handle_game_events():
                 change_volume()
             if event.key == pygame.K_f:
                 fps = 60 if fps == 120 else 120
+            if event.key == pygame.K_F3:
+                profiler.toggle()
 
 
 # set to none if you do not wish to constrain
@@ -769,7 +2207,7 @@ def handle_boss_logic():
     global boss
 
     # control the bosses movement
-    if (frame_counter % 60 == 0):
+    if (tick % SIMULATION_RATE == 0):
         boss.vx += random.randint(-2, 2)
         boss.vy += random.randint(-2, 2)
 
@@ -779,55 +2217,40 @@ def handle_boss_logic():
         boss.vy = constrain(boss.vy, -max_velocity, max_velocity)
 
     # control the bosses shooting
-    if(frame_counter % constrain((13 - boss.level) * fps_scaler(), 8 * fps_scaler(), 13 * fps_scaler()) == 0):
+    if(tick % constrain((13 - boss.level) * fps_scaler(), 8 * fps_scaler(), 13 * fps_scaler()) == 0):
         if (random.randint(0, 100) < (50+int(boss.level/4))):
             boss_shoot()
 
     if boss.level >= 2:
-        if state_current_frame() % (60 * 15) == 0:
+        if state_current_tick() % (SIMULATION_RATE * 15) == 0:
             # pick a random 1 or 2
             boss_summon(random.randint(1, 2))
 
 
 def boss_summon(mob_type=1):
-    global trash_mobs
+    # send in a wave of 4 trash mobs from the right of the screen
 
     if mob_type == 1:
-
-        spacing = 0
-        mob_type = 'ships/trash1.gif'
+        sprite = TRASH_SPRITES[0]
         base_y = random.randint(100, 500)
+        hp = boss.level * 10
+        gap = 1.2
+        amplitude = 200
 
-        for i in range(0, 4):
-            new_mob = Ship(mob_type, scale=.5)
-            new_mob.max_hp = boss.level * 10
-            new_mob.hp = new_mob.max_hp
-            new_mob.x = width + new_mob.w * new_mob.scale + spacing
-            spacing += int(new_mob.w * new_mob.scale * 1.2)
-            new_mob.y = base_y
-            new_mob.vx = -3
-            new_mob.vy = 0
-            new_mob.flip_h()
-            trash_mobs.append(new_mob)
-
-    if mob_type == 2:
-
-        spacing = 0
-        mob_type = 'ships/trash2.gif'
+    elif mob_type == 2:
+        sprite = TRASH_SPRITES[1]
         base_y = -25
+        hp = boss.level * 20
+        gap = 1.4
+        amplitude = 30
 
-        for i in range(0, 4):
-            new_mob = Ship(mob_type, scale=1.25)
-            new_mob.max_hp = boss.level * 20
-            new_mob.hp = new_mob.max_hp
-            new_mob.x = width + new_mob.w * new_mob.scale + spacing
-            spacing += int(new_mob.w * new_mob.scale * 1.4)
-            new_mob.y = base_y
-            new_mob.sinusoid_speed = 30
-            new_mob.vx = -3
-            new_mob.vy = 0
-            new_mob.flip_h()
-            trash_mobs.append(new_mob)
+    else:
+        return
+
+    mob_width = swarm.kinds[swarm.add_kind(sprite)].width
+    spacing = int(mob_width * gap)
+    xs = [width + mob_width + spacing * i for i in range(4)]
+    swarm.spawn(sprite, xs, base_y, -3, hp, amplitude)
 
 
 def player_shoot():
@@ -1050,14 +2473,73 @@ def boss_shoot_random_heal():
         return 1
 
 
+# collision masks for circular projectiles keyed by radius
+circle_masks = {}
+
+
+def get_circle_mask(radius):
+    # projectiles only come in a handful of sizes so build each bullet
+    # collision mask the first time it is needed and reuse it afterwards
+    mask = circle_masks.get(radius)
+    if mask is None:
+        surface = pygame.Surface((radius * 2, radius * 2))
+        pygame.draw.circle(surface, (0, 0, 0), (radius, radius), radius)
+        mask = pygame.mask.from_surface(surface)
+        circle_masks[radius] = mask
+    return mask
+
+
+def sprite_angle():
+    # spinning projectiles turn a degree every 60th of a second of game
+    # time, so how they are drawn and what they hit does not depend on the
+    # frame rate
+    return int(tick * base_fps / SIMULATION_RATE) % 360
+
+
+def projectile_atlas(projectile):
+    # the rotation atlas of a projectile drawn as a spinning sprite, or None
+    # for projectiles drawn as circles, which includes every heal
+    if projectile.damage < 0:
+        return None
+    match projectile.type:
+        case ProjectileType.Meatball:
+            return meatball_atlas
+        case ProjectileType.Noodle:
+            return noodle_atlas
+    return None
+
+
+def projectile_masks(pool, indices):
+    # the collision mask of each of the given projectiles with the position
+    # of its top left corner, reading the pool's columns once rather than
+    # going through PooledProjectile
+    xs = pool.x[indices].tolist()
+    ys = pool.y[indices].tolist()
+    radii = pool.radius[indices].tolist()
+    sprites = (sprite_reach[pool.type[indices]] > 0) & (pool.damage[indices] >= 0)
+
+    masks = []
+    angle = sprite_angle()
+    for i, sprite in enumerate(sprites.tolist()):
+        if not sprite:
+            radius = radii[i]
+            masks.append((get_circle_mask(radius), xs[i] - radius, ys[i] - radius))
+        else:
+            atlas = projectile_atlas(PooledProjectile(pool, indices[i]))
+            mask, (ox, oy) = atlas.mask(angle)
+            masks.append((mask, xs[i] + ox, ys[i] + oy))
+    return masks
+
+
 def projectile_hits_ship(projectile, ship):
 
-    # save the bounding box of the ship
-    ship_box = [(ship.x, ship.y),
-                (ship.x + (ship.w * ship.scale), ship.y + (ship.h * ship.scale))]
+    # save the bounding box of the solid part of the ship
+    left, top, right, bottom = ship_bounds(ship)
+    ship_box = [(left, top), (right, bottom)]
 
-    # save the location of the projectile and it's raidius
-    projectile_r = projectile.radius
+    # save the location of the projectile and how far it reaches
+    atlas = projectile_atlas(projectile)
+    projectile_r = projectile.radius if atlas is None else atlas.reach
     projectile_center = (projectile.x, projectile.y)
 
     # calculate the distance from the box to the projectile
@@ -1079,113 +2561,143 @@ def projectile_hits_ship(projectile, ship):
     # if it appears the projectile is inside the box perform a collision against the mask
     if distance <= projectile_r:
 
-        if projectile.type == ProjectileType.Circle or projectile.damage < 0 or projectile.type == ProjectileType.ForwardTorpedo:
+        if atlas is None:
             # if the projectile is a circle, perform a circle collision
-            # against the mask of a circle. begin by drawing the bullet
-            # collision mask
-            surface = pygame.Surface(
-                (projectile.radius * 2, projectile.radius * 2))
-            pygame.draw.circle(
-                surface,
-                (0, 0, 0),
-                (projectile.radius, projectile.radius),
-                projectile.radius
-            )
-            projectile_mask = pygame.mask.from_surface(surface)
+            # against the mask of a circle
+            projectile_mask = get_circle_mask(projectile.radius)
             return ship.collide_mask(projectile_mask, projectile.x - projectile.radius, projectile.y - projectile.radius)
         else:
-            # if the projectile is a sprite we will need to draw
-            # collide the sprite's mask against the ship's mask
-            # for now just return false
-            return False
+            # if the projectile is a sprite collide the mask of the frame
+            # being drawn this frame against the ship's mask
+            projectile_mask, (ox, oy) = atlas.mask(sprite_angle())
+            return ship.collide_mask(projectile_mask, projectile.x + ox, projectile.y + oy)
 
     else:
         return False
 
 
+class OccupancyMask:
+    # every projectile near a ship stamped into one mask laid over the ship's
+    # own, so a frame where nothing touches the ship costs a single overlap
+    # test. the projectiles are placed relative to the ship exactly the way
+    # Ship.collide_mask places them, so this only reports an overlap when at
+    # least one of them would have hit on its own
+    def __init__(self):
+        self.mask = None
+
+    def overlaps(self, pool, indices, ship):
+        size = ship.mask.get_size()
+        if self.mask is None or self.mask.get_size() != size:
+            self.mask = pygame.mask.Mask(size)
+        else:
+            self.mask.clear()
+
+        for mask, x, y in projectile_masks(pool, indices):
+            self.mask.draw(mask, (-int(ship.x - x), -int(ship.y - y)))
+
+        return ship.mask.overlap(self.mask, (0, 0)) is not None
+
+
+player_occupancy = OccupancyMask()
+
+
+def ship_bounds(ship):
+    # the box around the solid part of a ship as left, top, right, bottom.
+    # it is a pixel wider all round to cover the rounding in
+    # Ship.collide_mask, but never wider than the ship itself
+    solid = ship.solid_rect
+    return (ship.x + max(solid.left - 1, 0),
+            ship.y + max(solid.top - 1, 0),
+            ship.x + min(solid.right + 1, ship.w * ship.scale),
+            ship.y + min(solid.bottom + 1, ship.h * ship.scale))
+
+
 def collide():
     global damage_done
 
-
-    for projectile in player_projectiles:
-        # check if the projectile x y is within the boss x y + w h
-        #        if(projectile.x > boss.x and projectile.x < boss.x + boss.w * boss.scale and projectile.y > boss.y and projectile.y < boss.y + boss.h * boss.scale):
-        if not projectile.hit:
-            if(projectile_hits_ship(projectile, boss)):
-                # play the player hit sound
-                pygame.mixer.Sound.play(sfx['player_hit'])
-                boss.hp -= projectile.damage
-                # record the damage done
-                damage_done += projectile.damage
-                # player_projectiles.remove(projectile)
-                projectile.hit = True
-                boss.frame_last_hit = frame_counter
-            for trash_mob in trash_mobs:
-                if projectile_hits_ship(projectile, trash_mob):
-                    # play the player hit sound
-                    pygame.mixer.Sound.play(sfx['player_hit'])
-                    trash_mob.hp -= projectile.damage
-                    trash_mob.frame_last_hit = frame_counter
-                    # player_projectiles.remove(projectile)
-                    projectile.hit = True
-                    if trash_mob.hp <= 0:
-                        trash_mobs.remove(trash_mob)
-
-            # if the projectile is now a hit perform life steal if the player
-            # has a life steal upgrade
-            if projectile.hit and player.life_steal > 0:
-                player.hp += math.ceil(projectile.damage * (player.life_steal / 100))
-
-    # collide boss projectiles with the player
-    for projectile in boss_projectiles:
-        # check if the projectile x y is within the player x y + w h
-        # if(projectile.x > player.x and projectile.x < player.x + player.w * player.scale and projectile.y > player.y and projectile.y < player.y + player.h * player.scale):
-        if not projectile.hit:
-            if(projectile_hits_ship(projectile, player)):
-                # play the boss hit sound effect
-
-                if projectile.damage < 0:
-                    pygame.mixer.Sound.play(sfx['player_heal'])
-                else:
-                    # check if the player has a deflect active
-                    if time_frame_start - time_last_deflect < duration_deflect:
-                        projectile.damage = 0
-                        pygame.mixer.Sound.play(sfx['deflect'])
-                        # create a new projectile that is a player projectile with reversed direction
-                        player_projectiles.append(
-                            fire_projectile(
-                                player,
-                                boss,
-                                3,
-                                int(attack_power * 2),
-                                PURPLE,
-                                6,
-                                20
-                            )
+    # bucket the projectiles that can still hit something so each ship only
+    # has to test the projectiles near its bounding box
+    player_projectile_grid.rebuild(player_projectiles)
+    boss_projectile_grid.rebuild(boss_projectiles)
+
+    for index in player_projectile_grid.candidates(*ship_bounds(boss)):
+        projectile = PooledProjectile(player_projectiles, index)
+        if(projectile_hits_ship(projectile, boss)):
+            # play the player hit sound
+            pygame.mixer.Sound.play(sfx['player_hit'])
+            boss.hp -= projectile.damage
+            # record the damage done
+            damage_done += projectile.damage
+            projectile.hit = True
+            boss.frame_last_hit = frame_counter
+
+    for mob, damage in swarm.collide(player_projectiles, player_projectile_grid):
+        # play the player hit sound
+        pygame.mixer.Sound.play(sfx['player_hit'])
+
+    # perform life steal for every projectile that hit this frame if the
+    # player has a life steal upgrade
+    if player.life_steal > 0:
+        for index in player_projectile_grid.hits(player_projectiles):
+            projectile = PooledProjectile(player_projectiles, index)
+            player.hp += math.ceil(projectile.damage * (player.life_steal / 100))
+
+    # collide boss projectiles with the player. with occupancy collisions on
+    # they are only tested one at a time when at least one of them hits
+    candidates = boss_projectile_grid.candidates(*ship_bounds(player))
+    if OCCUPANCY_COLLISIONS and len(candidates):
+        if not player_occupancy.overlaps(boss_projectiles, candidates, player):
+            candidates = candidates[:0]
+
+    for index in candidates:
+        projectile = PooledProjectile(boss_projectiles, index)
+        if(projectile_hits_ship(projectile, player)):
+            # play the boss hit sound effect
+
+            if projectile.damage < 0:
+                pygame.mixer.Sound.play(sfx['player_heal'])
+            else:
+                # check if the player has a deflect active
+                if time_frame_start - time_last_deflect < duration_deflect:
+                    projectile.damage = 0
+                    pygame.mixer.Sound.play(sfx['deflect'])
+                    # create a new projectile that is a player projectile with reversed direction
+                    player_projectiles.append(
+                        fire_projectile(
+                            player,
+                            boss,
+                            3,
+                            int(attack_power * 2),
+                            PURPLE,
+                            6,
+                            20
                         )
+                    )
 
-                    else:
-                        pygame.mixer.Sound.play(sfx['boss_hit'])
-                        projectile.damage -= player.defense_level
-                        projectile.damage = constrain(projectile.damage, 1, None)
-                        player.frame_last_hit = frame_counter
+                else:
+                    pygame.mixer.Sound.play(sfx['boss_hit'])
+                    projectile.damage -= player.defense_level
+                    projectile.damage = constrain(projectile.damage, 1, None)
+                    player.frame_last_hit = frame_counter
 
-                player.hp -= projectile.damage
+            player.hp -= projectile.damage
 
-                # boss_projectiles.remove(projectile)
-                projectile.hit = True
+            # boss_projectiles.remove(projectile)
+            projectile.hit = True
 
     # cap the player at double their max hp
     player.hp = constrain(player.hp, -player.max_hp, player.max_hp * 2)
 
 
 def update_game():
-    global game_state, boss_projectiles, player_projectiles, trash_mobs
+    global game_state
     # move the stars
     move_starfield()
 
-    handle_game_inputs()
-    handle_boss_logic()
+    with profiler.phase('inputs'):
+        handle_game_inputs()
+    with profiler.phase('boss logic'):
+        handle_boss_logic()
 
     # move the player ship
     player.move()
@@ -1209,26 +2721,19 @@ def update_game():
                 print("PERFECT CORNER HIT! CHEERS ERUPT FROM SCRANTON, PA FOR " +
                       boss.name + " AS IT DESTROYS YOU")
 
-    for trash_mob in trash_mobs:
-        trash_mob.move(False)
+    # move the trash mobs, dropping the ones that flew off screen
+    swarm.move()
 
-    # check for trash mobs that are off screen and remove them
-    for trash_mob in trash_mobs:
-        if trash_mob.x < -trash_mob.w * trash_mob.scale:
-            trash_mobs.remove(trash_mob)
-
-    if state_current_frame() % 60 == 0:
-        for trash_mob in trash_mobs:
-            boss_projectiles.append(
-                fire_projectile(trash_mob, player, 2, boss.level,
-                                ORANGE, 8, 8, can_heal=False, ox=-10, oy=20)
-            )
+    if state_current_tick() % SIMULATION_RATE == 0:
+        swarm.fire(boss_projectiles, player, boss.level, ORANGE, 8, 8, ox=-10, oy=20)
 
     # move the projectiles
-    move_projectiles()
+    with profiler.phase('move projectiles'):
+        move_projectiles()
 
     # calculate collisions
-    collide()
+    with profiler.phase('collide'):
+        collide()
 
     # check for player death
     if player.hp <= 0:
@@ -1238,19 +2743,19 @@ def update_game():
         player.hp = 0
         player.deaths += 1
         game_state = GameState.GameOver
-        # boss_projectiles = []
-        player_projectiles = []
-        trash_mobs = []
+        # boss_projectiles.clear()
+        player_projectiles.clear()
+        swarm.clear()
 
     # check for level up
     if boss.hp <= 0:
         # play the boss death sound
         pygame.mixer.Sound.play(sfx['level_up'])
-        trash_mobs = []
+        swarm.clear()
         game_state = GameState.Victory
         # clear active projectiles from the board
-        boss_projectiles = []
-        # player_projectiles = []
+        boss_projectiles.clear()
+        # player_projectiles.clear()
         boss.level += 1
         player.level += 1
         boss.max_hp *= 1.5
@@ -1258,14 +2763,106 @@ def update_game():
         player.hp = constrain(player.hp + 10, 0, player.max_hp)
 
 
-def draw_projectiles():
-    # draw the player projectiles
-    for projectile in player_projectiles:
-        projectile.draw()
+class Interpolator:
+    # remembers where the ships and space objects were at the start of a
+    # tick, then while a frame is drawn moves them alpha of the way from
+    # there to where they are now and puts them back afterwards
+    def __init__(self):
+        self.previous = {}
+        self.current = {}
+
+    def save(self, things):
+        self.previous = {thing: (thing.x, thing.y) for thing in things}
+
+    def apply(self, things, alpha):
+        for thing in things:
+            previous = self.previous.get(thing)
+            if previous is None:
+                continue
+
+            # anything that moved further than it could in one tick was put
+            # there, so draw it where it is instead of sliding it across
+            x, y = thing.x, thing.y
+            px, py = previous
+            if abs(x - px) > INTERPOLATION_JUMP or abs(y - py) > INTERPOLATION_JUMP:
+                continue
+
+            self.current[thing] = (x, y)
+            thing.x = px + (x - px) * alpha
+            thing.y = py + (y - py) * alpha
+
+    def restore(self):
+        for thing, (x, y) in self.current.items():
+            thing.x = x
+            thing.y = y
+        self.current = {}
+
+
+interpolator = Interpolator()
+
+
+def moving_things():
+    return [player, boss] + space_objects
+
+
+def save_positions():
+    interpolator.save(moving_things())
+    starfield.save_positions()
+    swarm.save_positions()
+    player_projectiles.save_positions()
+    boss_projectiles.save_positions()
+
+
+def draw_interpolated(alpha):
+    # draw the screen part way between the last two ticks
+    interpolator.apply(moving_things(), alpha)
+    starfield.interpolate(alpha)
+    swarm.interpolate(alpha)
+    player_projectiles.interpolate(alpha)
+    boss_projectiles.interpolate(alpha)
+
+    draw_screen()
 
-    # draw the boss projectiles
-    for projectile in boss_projectiles:
-        projectile.draw()
+    interpolator.restore()
+    starfield.restore()
+    swarm.restore()
+    player_projectiles.restore()
+    boss_projectiles.restore()
+
+
+def run_game():
+    # run as many fixed length ticks as it takes for the game to catch up
+    # with the clock, then draw. the render rate, the K_f toggle and dropped
+    # frames change how often the game is drawn but not how it plays
+    global simulating, tick, tick_time, time_frame_start, state_start_tick
+
+    step = 1 / SIMULATION_RATE
+    now = game_time()
+
+    # start the game clock one tick behind on the first frame, and forget
+    # about time lost to a stall rather than racing to catch up on it
+    if state_current_frame() == 0:
+        state_start_tick = tick
+        tick_time = now - step
+    elif now - tick_time > MAX_FRAME_TIME:
+        tick_time = now - MAX_FRAME_TIME
+
+    simulating = True
+    while tick_time + step <= now + 1e-9 and game_state == GameState.Game:
+        save_positions()
+        tick_time += step
+        time_frame_start = tick_time
+        update_game()
+        tick += 1
+    simulating = False
+
+    draw_interpolated(constrain((now - tick_time) / step, 0, 1))
+
+
+def draw_projectiles():
+    with profiler.phase('draw projectiles'):
+        # draw the player projectiles, then the boss projectiles on top
+        projectile_renderer.draw(screen, (player_projectiles, boss_projectiles))
 
 
 def draw_screen():
@@ -1296,65 +2893,287 @@ def draw_screen():
     boss.draw()
 
     # draw the trash mobs
-    for trash_mob in trash_mobs:
-        trash_mob.draw()
+    swarm.draw(screen)
 
     # draw the projectiles
     draw_projectiles()
 
-    draw_bar(player, 0, player.hp, player.max_hp, GREEN, YELLOW)                        # player health
-    draw_bar(player, 1, player.hp - player.max_hp, player.max_hp, BLUE, YELLOW, True)   # player shield (if hp > max_hp)
-    if time_frame_start - time_last_deflect < cooldown_deflect:
-        draw_bar(player, 2, time_frame_start - time_last_deflect, cooldown_deflect, PURPLE, YELLOW)
+    with profiler.phase('hud'):
+        draw_bar(player, 0, player.hp, player.max_hp, GREEN, YELLOW)                        # player health
+        draw_bar(player, 1, player.hp - player.max_hp, player.max_hp, BLUE, YELLOW, True)   # player shield (if hp > max_hp)
+        if time_frame_start - time_last_deflect < cooldown_deflect:
+            draw_bar(player, 2, time_frame_start - time_last_deflect, cooldown_deflect, PURPLE, YELLOW)
 
-    draw_bar(boss, 0, boss.hp, boss.max_hp, RED, YELLOW)                                # boss health
+        draw_bar(boss, 0, boss.hp, boss.max_hp, RED, YELLOW)                                # boss health
 
-    for trash_mob in trash_mobs:
-        draw_bar(trash_mob, 0, trash_mob.hp, trash_mob.max_hp, BLUE, YELLOW)
-        draw_hp_bar(BLUE, trash_mob)
+        swarm.draw_hp_bars(screen)
 
 
-    draw_score_line()
+        draw_score_line()
 
-    draw_boss_text()
+        draw_boss_text()
 
     # update the screen
-    pygame.display.flip()
+    present_screen()
 
 
-def draw_score_line():
-    # draw the score line
+def present_screen():
+    if profiler.visible:
+        draw_profiler()
+
+    with profiler.phase('flip'):
+        pygame.display.flip()
+
+
+# rendered text surfaces keyed by (font, string, color)
+text_cache = LRUCache(TEXT_CACHE_SIZE)
+
+
+def render_text(font, text, color, background=None):
+    # render a string once and reuse the surface until it is evicted. like
+    # the asset cache the surfaces are shared so never draw onto them
+    key = (font, text, color, background)
+    surface = text_cache.get(key)
+    if surface is None:
+        surface = font.render(text, True, color, background)
+        text_cache.put(key, surface)
+    return surface
 
-    text_score_line = font_small.render(
-        "Deaths: " + str(player.deaths) +
+
+class HudLayer:
+    # a piece of the HUD that is only composed again when the values it
+    # shows change. compose receives the values and returns a surface
+    def __init__(self, compose):
+        self.compose = compose
+        self.values = None
+        self.surface = None
+
+    def draw(self, surface, values, position):
+        if values != self.values:
+            self.surface = self.compose(*values)
+            self.values = values
+        surface.blit(self.surface, position)
+
+
+def compose_score_line(deaths, power, speed, defense, hp, max_hp, dps, volume, fps_actual, fps_target):
+    text_score_line = render_text(
+        font_small,
+        "Deaths: " + str(deaths) +
         # "Level: " + str(player.level) +
-        "  Power: " + str(attack_power) +
+        "  Power: " + str(power) +
 
-        "  Speed: " + "{0:.3f}".format(cooldown_attack) +
-        "  Defense: " + str(player.defense_level + 1) +
-        "  HP: " + str(constrain(player.hp, -player.hp,
-                                 player.max_hp)) + "/" + str(player.max_hp),
-        True,
+        "  Speed: " + "{0:.3f}".format(speed) +
+        "  Defense: " + str(defense + 1) +
+        "  HP: " + str(constrain(hp, -hp, max_hp)) + "/" + str(max_hp),
         (255, 255, 255)
     )
 
-    # draw your shield level
-    if player.hp > player.max_hp:
-        text_shield_level = font_small.render(
-            "+ " + str(player.hp-player.max_hp), True, (100, 100, 255))
-        screen.blit(text_shield_level, (text_score_line.get_width() + 10, 680))
-
-    text_status_line = font_tiny.render(
+    text_status_line = render_text(
+        font_tiny,
         "DPS: " + str(dps) +
         "  Volume: " + str(volume) + "%" +
-        "  FPS (Target): " + str(round(clock.get_fps())) +
-        " (" + str(fps) + ")",
-        True,
+        "  FPS (Target): " + str(fps_actual) +
+        " (" + str(fps_target) + ")",
         (180, 180, 180)
     )
 
-    screen.blit(text_score_line, (0, 680))
-    screen.blit(text_status_line, (0, 680+text_score_line.get_height()))
+    layer = pygame.Surface(
+        (width, text_score_line.get_height() + text_status_line.get_height()),
+        pygame.SRCALPHA
+    )
+
+    # draw your shield level
+    if hp > max_hp:
+        text_shield_level = render_text(
+            font_small, "+ " + str(hp - max_hp), (100, 100, 255))
+        layer.blit(text_shield_level, (text_score_line.get_width() + 10, 0))
+
+    layer.blit(text_score_line, (0, 0))
+    layer.blit(text_status_line, (0, text_score_line.get_height()))
+
+    return layer
+
+
+hud_score_line = HudLayer(compose_score_line)
+
+
+class PhaseTiming:
+    # adds the time spent inside a with block to one phase of the frame. one
+    # is kept per phase so timing a phase does not allocate anything, and
+    # nested blocks of the same phase are only counted once
+    def __init__(self, profiler, index):
+        self.profiler = profiler
+        self.index = index
+        self.start = 0
+        self.depth = 0
+
+    def __enter__(self):
+        if self.depth == 0:
+            self.start = time.perf_counter()
+        self.depth += 1
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            self.profiler.current[self.index] += time.perf_counter() - self.start
+
+
+class FrameProfiler:
+    # keeps a rolling history of how long each phase of the frame took. any
+    # part of the frame not inside a phase is counted as other
+    def __init__(self, phases, history=PROFILER_HISTORY):
+        self.names = [name for name, color in phases] + ['other']
+        self.timings = {name: PhaseTiming(self, index)
+                        for index, (name, color) in enumerate(phases)}
+        self.current = [0.0] * len(phases)
+        self.history = np.zeros((history, len(self.names)))
+        self.frames = 0
+        self.frame_start = time.perf_counter()
+        self.visible = False
+
+        # one color per phase, then other, then the graph background
+        self.colors = np.array(
+            [color for name, color in phases] + [(90, 90, 90), (20, 20, 20)],
+            dtype=np.uint8
+        )
+        self.graph = pygame.Surface((history, PROFILER_GRAPH_HEIGHT))
+        self.graph.set_alpha(220)
+        self.graph_frames = 0
+        self.graph_budget = None
+        self.legend = HudLayer(self.compose_legend)
+        self.legend_values = None
+
+    def phase(self, name):
+        return self.timings[name]
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.graph_budget = None
+        self.legend_values = None
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        for index in range(len(self.current)):
+            self.current[index] = 0.0
+
+    def end_frame(self):
+        total = time.perf_counter() - self.frame_start
+        row = self.history[self.frames % len(self.history)]
+        row[:-1] = self.current
+        row[-1] = max(total - sum(self.current), 0)
+        self.frames += 1
+
+    def graph_columns(self, frames, budget):
+        # stack the phases of each frame into one column of pixels. the graph
+        # is two frame budgets tall
+        pixels_per_second = PROFILER_GRAPH_HEIGHT / (budget * 2)
+        tops = np.cumsum(frames, axis=1) * pixels_per_second
+        heights = np.arange(PROFILER_GRAPH_HEIGHT - 1, -1, -1)
+        phase = (heights[None, :, None] >= tops[:, None, :]).sum(axis=2)
+        return self.colors[phase]
+
+    def update_graph(self, history, budget):
+        # scroll the graph left and only draw the frames added since it was
+        # last drawn. the whole graph is drawn again when the budget changes
+        added = self.frames - self.graph_frames
+        if budget != self.graph_budget or added >= len(history):
+            pygame.surfarray.blit_array(self.graph, self.graph_columns(history, budget))
+        elif added > 0:
+            self.graph.scroll(-added, 0)
+            columns = pygame.surfarray.make_surface(
+                self.graph_columns(history[-added:], budget))
+            self.graph.blit(columns, (len(history) - added, 0))
+        self.graph_frames = self.frames
+        self.graph_budget = budget
+
+    def draw(self, surface, counts, budget, position=(10, 10)):
+        # the history oldest frame first
+        history = np.roll(self.history, -(self.frames % len(self.history)), axis=0)
+        self.update_graph(history, budget)
+
+        left, top = position
+        surface.blit(self.graph, position)
+        budget_y = top + PROFILER_GRAPH_HEIGHT // 2
+        pygame.draw.line(surface, WHITE, (left, budget_y),
+                         (left + len(self.history) - 1, budget_y))
+
+        # the numbers are only refreshed a few times a second so they can
+        # be read, and so the legend is not composed again every frame
+        if self.legend_values is None or self.frames % PROFILER_REFRESH == 0:
+            means = history.mean(axis=0) * 1000
+            totals = history.sum(axis=1) * 1000
+            self.legend_values = (
+                tuple(round(mean, 2) for mean in means),
+                round(totals.mean(), 2),
+                round(totals.max(), 2),
+                round(budget * 1000, 2),
+            ) + tuple(counts)
+        self.legend.draw(surface, self.legend_values,
+                         (left, top + PROFILER_GRAPH_HEIGHT + 4))
+
+    def compose_legend(self, means, mean, peak, budget, stars, projectiles, mobs):
+        lines = [
+            (None, "frame " + "{0:.2f}".format(mean) + " ms, max " +
+             "{0:.2f}".format(peak) + " ms, budget " + "{0:.2f}".format(budget) + " ms"),
+            (None, "stars " + str(stars) + "  projectiles " + str(projectiles) +
+             "  trash mobs " + str(mobs)),
+        ]
+        for name, color, phase_mean in zip(self.names, self.colors, means):
+            lines.append((color, name.ljust(18) + "{0:6.2f}".format(phase_mean) + " ms"))
+
+        line_height = font_tiny.get_height() + 2
+        swatch = font_tiny.get_height()
+        rendered = [(color, render_text(font_tiny, text, WHITE)) for color, text in lines]
+        layer = pygame.Surface(
+            (max(text.get_width() for color, text in rendered) + swatch + 10,
+             line_height * len(lines) + 4),
+            pygame.SRCALPHA
+        )
+        layer.fill((0, 0, 0, 160))
+        for line, (color, text) in enumerate(rendered):
+            y = 2 + line * line_height
+            x = 2
+            if color is not None:
+                pygame.draw.rect(layer, color, (x, y, swatch, swatch))
+                x += swatch + 6
+            layer.blit(text, (x, y))
+        return layer
+
+
+profiler = FrameProfiler(PROFILER_PHASES)
+
+
+def draw_profiler():
+    profiler.draw(
+        screen,
+        (
+            len(starfield.x) if starfield is not None else 0,
+            len(player_projectiles) + len(boss_projectiles),
+            len(swarm)
+        ),
+        1 / fps
+    )
+
+
+def draw_score_line():
+    # draw the score line
+    with profiler.phase('hud'):
+        hud_score_line.draw(
+            screen,
+            (
+                player.deaths,
+                attack_power,
+                cooldown_attack,
+                player.defense_level,
+                player.hp,
+                player.max_hp,
+                dps,
+                volume,
+                round(clock.get_fps()),
+                fps
+            ),
+            (0, 680)
+        )
 
 
 def draw_bar(ship, position, value_current, value_max, foreground_color, background_color = YELLOW, background_transparent: bool = False, bar_height = 8):
@@ -1391,35 +3210,10 @@ def draw_bar(ship, position, value_current, value_max, foreground_color, backgro
 
 
 
-def draw_hp_bar(color, ship):
-    pygame.draw.rect(
-        screen,
-        (255, 255, 0),
-        (
-            ship.x,
-            ship.y + ship.h * ship.scale,
-            ship.w * ship.scale,
-            10
-        )
-    )
-
-    pygame.draw.rect(
-        screen,
-        color,
-        (
-            ship.x,
-            ship.y + ship.h * ship.scale,
-            (ship.w * ship.scale) *
-            (constrain(ship.hp, 0, ship.max_hp) / ship.max_hp),
-            10
-        )
-    )
-
-
 def draw_boss_text():
 
-    text_boss_line = font_small.render(
-        boss.name + " HP: " + "{:0.0f}".format(boss.hp), True, (255, 100, 100))
+    text_boss_line = render_text(
+        font_small, boss.name + " HP: " + "{:0.0f}".format(boss.hp), (255, 100, 100))
 
     screen.blit(text_boss_line, (width - text_boss_line.get_width(), 680))
 
@@ -1461,7 +3255,7 @@ def run_title_screen():
     draw_heading()
 
     # check for key press of space
-    keys = pygame.key.get_pressed()
+    keys = get_pressed_keys()
 
     joy_shoot = False
 
@@ -1478,7 +3272,7 @@ def run_title_screen():
         game_state = GameState.Quit
 
     # update the screen
-    pygame.display.flip()
+    present_screen()
 
 
 def draw_heading():
@@ -1486,6 +3280,41 @@ def draw_heading():
                 (width / 2 - text_title_heading.get_width()/2,
                  50))
 
+
+def run_loading_screen():
+    global game_state, loading, state_start_frame
+
+    try:
+        progress = next(loading)
+    except StopIteration:
+        loading = None
+        print_startup_time()
+        start_streaming()
+        game_state = GameState.Title
+
+        # --level waits for the ships to be loaded. the level starts part
+        # way through this frame, so its first frame, where run_game starts
+        # the clock, is the next one
+        if start_at_level is not None:
+            start_level(start_at_level)
+            state_start_frame = frame_counter + 1
+        return
+
+    screen.fill(BLACK)
+    draw_heading()
+
+    # draw the progress bar with the percentage below it
+    bar_width = width / 2
+    bar_x = width / 2 - bar_width / 2
+    bar_y = height / 2 - 16
+    pygame.draw.rect(screen, WHITE, (bar_x - 4, bar_y - 4, bar_width + 8, 40), 2)
+    pygame.draw.rect(screen, CYAN, (bar_x, bar_y, bar_width * progress, 32))
+
+    text_loading = render_text(font_small, "LOADING " + str(int(progress * 100)) + "%", WHITE)
+    screen.blit(text_loading, (width / 2 - text_loading.get_width() / 2, bar_y + 60))
+
+    present_screen()
+
 def run_ending_screen():
     # draw a starry background
     screen.fill(BLACK)
@@ -1493,7 +3322,7 @@ def run_ending_screen():
     draw_starfield()
 
     CONGRATULATIONS = "CONGRATULATIONS!!!"
-    text_congratulations = font_large.render(CONGRATULATIONS, True, (255, 255, 255))
+    text_congratulations = render_text(font_large, CONGRATULATIONS, (255, 255, 255))
     screen.blit(text_congratulations, (width / 2 - text_congratulations.get_width()/2, 50))
 
 
@@ -1542,15 +3371,15 @@ def run_ending_screen():
 
 
     for i in range(len(ending_dialog)):
-        text = font_small.render(ending_dialog[i], True, (255, 255, 255))
+        text = render_text(font_small, ending_dialog[i], (255, 255, 255))
         screen.blit(text, (width / 2 - text.get_width()/2, 150 + i * 25))
 
 
     # update the screen
-    pygame.display.flip()
+    present_screen()
 
     # save the display to a file in my pictures
-    if state_current_frame() == 0:
+    if state_current_frame() == 0 and not headless:
         # name the file with the current date and time
         now = datetime.datetime.now()
         filename = "THFRC-" + now.strftime("%Y-%m-%d_%H-%M-%S") + ".png"
@@ -1558,7 +3387,13 @@ def run_ending_screen():
 
 
 def run_victory_screen():
-    global game_state, background_speed, player_projectiles, upgrade_offers
+    global game_state, background_speed, upgrade_offers
+
+    # get the next boss ready in the background while the animation plays,
+    # finishing it on whichever frame the worker is done reading it
+    if state_current_frame() == 0:
+        boss_loader.preload(boss.level)
+    boss_loader.poll()
 
     # draw a starry background
     screen.fill(BLACK)
@@ -1569,30 +3404,34 @@ def run_victory_screen():
     draw_starfield()
     draw_projectiles()
 
-    if (state_current_frame() / 10 % 2 == 1) and state_current_frame() < 100 * fps_scaler():
+    # the animation is timed by the clock in 60ths of a second so it runs
+    # the same whatever the frame rate
+    elapsed = state_current_time() * base_fps
+
+    if (state_current_frame() / 10 % 2 == 1) and elapsed < 100:
         boss.draw()
 
-    # animate the player charging engines and zooming off
+    # animate the player charging engines and zooming off. the player moves
+    # its velocity every 60th of a second
     if state_current_frame() == 0:
-        player.vx = (400 - player.x) / (150 * fps_scaler())
-        player.vy = (height / 2 - player.y) / (150 * fps_scaler())
+        player.vx = (400 - player.x) / 150
+        player.vy = (height / 2 - player.y) / 150
 
-    if state_current_frame() >= 150 * fps_scaler():
+    if elapsed >= 150:
         player.vx = -3
         player.vy = 0
 
-    if state_current_frame() > 150 * fps_scaler():
+    if elapsed > 150:
         background_speed = constrain(
-            background_speed * 0.99, 0.1, BACKGROUND_SPEED_WARP)
-        player_projectiles = []
+            background_speed * 0.99 ** fps_divisor(), 0.1, BACKGROUND_SPEED_WARP)
+        player_projectiles.clear()
         # draw a circle expanding out from behind the player
-        flame_color_heating_up = 80 + \
-            (state_current_frame() * fps_divisor() - 150)
+        flame_color_heating_up = constrain(80 + (elapsed - 150), 0, 255)
         pygame.draw.circle(
             screen,
             (255, flame_color_heating_up, flame_color_heating_up),
             (player.x, player.y + player.h * player.scale / 2),
-            3 + (state_current_frame() - 150) / 8
+            3 + (elapsed - 150) / 8
         )
 
     # if state_current_frame() < 270 * fps_scaler():
@@ -1640,114 +3479,214 @@ def run_victory_screen():
     draw_score_line()
 
     # update the screen
-    pygame.display.flip()
-
-
-def load_boss():
-    global boss, enemy_units
+    present_screen()
 
-    # clear enemy units
-    enemy_units = []
 
-    # select the boss and name it
+def boss_design(level):
+    # pick the boss for a level, returning its name, the load_sprite
+    # arguments for its sprite and whether the sprite faces the wrong way
     boss_divisor = 15
-    sprite_selector = boss.level % boss_divisor
+    sprite_selector = level % boss_divisor
 
     boss_name_mark = 0
-    boss_level = boss.level
+    boss_level = level
     while boss_level > 0:
         boss_level -= boss_divisor
         boss_name_mark += 1
 
+    flip = False
+
     if sprite_selector == 0:
-        boss.name = "Roy Carnassus"
-        boss.change_sprite("ships/Zeromus2.gif", 0, 0,
-                           304, 256, None, 1)
-        boss.flip_h()
+        name = "Roy Carnassus"
+        sprite = ("ships/Zeromus2.gif", 0, 0,
+                  304, 256, None, 1)
+        flip = True
     elif sprite_selector == 1:
-        boss.name = "Doge"
-        boss.change_sprite("ships/doge.png", 0, 0,
-                           240, 174, None, 1)
+        name = "Doge"
+        sprite = ("ships/doge.png", 0, 0,
+                  240, 174, None, 1)
 
     elif sprite_selector == 2:
-        boss.name = "DVD Dreadnaught"
-        boss.change_sprite("ships/dvd.png", 1, 1, 1600, 740, None, 0.2)
+        name = "DVD Dreadnaught"
+        sprite = ("ships/dvd.png", 1, 1, 1600, 740, None, 0.2)
 
     elif sprite_selector == 3:
-        boss.name = "Sus Man"
-        boss.change_sprite("ships/susman.png", 0, 0,
-                           192, 231, None, 1)
+        name = "Sus Man"
+        sprite = ("ships/susman.png", 0, 0,
+                  192, 231, None, 1)
 
 
     elif sprite_selector == 4:
-        boss.name = "Evil Car"
-        boss.change_sprite("ships/evil-car.png", 0, 0,
-                           240, 131, None, 1)
+        name = "Evil Car"
+        sprite = ("ships/evil-car.png", 0, 0,
+                  240, 131, None, 1)
 
     elif sprite_selector == 5:
-        boss.name = "Rathtar Overlord"
-        boss.change_sprite("ships/plantboy.gif", 0, 0,
-                           126, 94, None, 1.5)
-        boss.flip_h()
+        name = "Rathtar Overlord"
+        sprite = ("ships/plantboy.gif", 0, 0,
+                  126, 94, None, 1.5)
+        flip = True
 
     elif sprite_selector == 6:
-        boss.name = "Doom Train"
-        boss.change_sprite("ships/train.gif", 0, 0,
-                           240, 208, None, 1)
+        name = "Doom Train"
+        sprite = ("ships/train.gif", 0, 0,
+                  240, 208, None, 1)
 
     elif sprite_selector == 7:
-        boss.name = "The Great Cthulhu"
-        boss.change_sprite("ships/cthulhu.png", 0, 0,
-                           722, 608, None, 0.3)
+        name = "The Great Cthulhu"
+        sprite = ("ships/cthulhu.png", 0, 0,
+                  722, 608, None, 0.3)
 
     elif sprite_selector == 8:
-        boss.name = "Flying Spaghetti Monster"
-        boss.change_sprite("ships/sgetti.png", 0, 0,
-                           1280, 1027, None, 0.25)
+        name = "Flying Spaghetti Monster"
+        sprite = ("ships/sgetti.png", 0, 0,
+                  1280, 1027, None, 0.25)
 
     elif sprite_selector == 9:
-        boss.name = "Zone Eater"
-        boss.change_sprite("ships/zone-eater.gif", 0, 0,
-                           190, 144, None, 1.5)
-        boss.flip_h()
+        name = "Zone Eater"
+        sprite = ("ships/zone-eater.gif", 0, 0,
+                  190, 144, None, 1.5)
+        flip = True
 
     elif sprite_selector == 10:
-        boss.name = "Morpha"
-        boss.change_sprite("ships/zombone.gif", 0, 0,
-                           128, 128, None, 2)
-        boss.flip_h()
+        name = "Morpha"
+        sprite = ("ships/Zombone.gif", 0, 0,
+                  128, 128, None, 2)
+        flip = True
 
     elif sprite_selector == 11:
-        boss.name = "Odin"
-        boss.change_sprite("ships/atma.gif", 0, 0,
-                           256, 256, None, 1)
-        boss.flip_h()
+        name = "Odin"
+        sprite = ("ships/atma.gif", 0, 0,
+                  256, 256, None, 1)
+        flip = True
 
     elif sprite_selector == 12:
-        boss.name = "Zombie Villager"
-        boss.change_sprite("ships/zombieeeeeee.png", 0, 0,
-                           146, 256, None, 1)
+        name = "Zombie Villager"
+        sprite = ("ships/zombieeeeeee.png", 0, 0,
+                  146, 256, None, 1)
 
 
     elif sprite_selector == 13:
 
-        boss.name = "Alexander"
-        boss.change_sprite("ships/Behemoth.gif", 0, 0,
-                           190, 96, None, 1.25)
-        boss.flip_h()
+        name = "Alexander"
+        sprite = ("ships/Behemoth.gif", 0, 0,
+                  190, 96, None, 1.25)
+        flip = True
 
     elif sprite_selector == 14:
 
-        boss.name = "Windows XP"
-        boss.change_sprite("ships/windoze.png", 0, 0,
-                           1364, 1203, None, 0.2)
-        boss.flip_h()
+        name = "Windows XP"
+        sprite = ("ships/windoze.png", 0, 0,
+                  1364, 1203, None, 0.2)
+        flip = True
 
 
-    boss.mask = pygame.mask.from_surface(boss.sprite)
-
     if boss_name_mark > 1:
-        boss.name += " Mk " + get_roman_numeral(boss_name_mark)
+        name += " Mk " + get_roman_numeral(boss_name_mark)
+
+    return name, sprite, flip
+
+
+def prepare_boss(sprite, flip):
+    # the boss sprite facing the way it flies in, with its damaged image and
+    # mask made, from the asset cache when it is there
+    asset = load_sprite(*sprite)
+    asset.orientation(flip_x=flip)
+    return asset
+
+
+class BossLoader:
+    # gets the next boss ready while the victory sequence plays. a worker
+    # thread reads and decodes a private copy of the sprite, then poll(),
+    # called every victory frame, finishes it on the main thread once the
+    # read is done, so load_boss only has to swap it in
+    def __init__(self):
+        self.executor = None
+        self.sprite = None
+        self.flip = None
+        self.future = None
+        self.asset = None
+
+    def preload(self, level):
+        name, sprite, flip = boss_design(level)
+        if (sprite, flip) == (self.sprite, self.flip):
+            return
+
+        self.sprite = sprite
+        self.flip = flip
+        self.future = None
+        self.asset = None
+        # nothing to read when the sprite is still cached
+        if asset_cache.get(sprite) is not None:
+            return
+
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='boss-loader')
+        self.future = self.executor.submit(read_asset, 'sprite', sprite, True)
+
+    def poll(self, wait=False):
+        # convert, scale, tint and mask the preloaded sprite once the worker
+        # has read it. returns True once the boss is ready
+        if self.sprite is None or self.asset is not None:
+            return self.asset is not None
+
+        if self.future is not None:
+            if not self.future.done():
+                if not wait:
+                    return False
+                print("Waiting for the next boss to finish loading...")
+            result, origin, seconds = self.future.result()
+            self.future = None
+            if asset_cache.get(self.sprite) is None:
+                asset_cache.put(self.sprite, finish_sprite(self.sprite, *result, origin))
+
+        self.asset = prepare_boss(self.sprite, self.flip)
+        return True
+
+    def take(self, sprite, flip):
+        # a preload that has not been finished yet is finished now since it
+        # is already part way through. anything not preloaded is prepared
+        # here and now
+        if (sprite, flip) == (self.sprite, self.flip):
+            self.poll(wait=True)
+            asset = self.asset
+            # it may have been evicted since it was prepared
+            asset_cache.put(sprite, asset)
+        else:
+            asset = prepare_boss(sprite, flip)
+
+        self.sprite = self.flip = self.future = self.asset = None
+        return asset
+
+    def shutdown(self):
+        # wait for a preload still running so no worker is left decoding
+        # after pygame quits
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        self.sprite = self.flip = self.future = self.asset = None
+
+
+boss_loader = BossLoader()
+
+
+def load_boss():
+    global boss, enemy_units
+
+    # clear enemy units
+    enemy_units = []
+
+    name, sprite, flip = boss_design(boss.level)
+    asset = boss_loader.take(sprite, flip)
+
+    filename, x, y, w, h, color_key, scale = sprite
+    boss.name = name
+    boss.w = w
+    boss.h = h
+    boss.scale = scale
+    boss.color_key = color_key
+    boss.set_asset(asset, flip_x=flip)
 
 
 def get_roman_numeral(number):
@@ -1773,17 +3712,17 @@ def get_roman_numeral(number):
 
 
 def draw_starfield():
-    # draw the stars
-    for star in stars:
-        star.draw()
+    with profiler.phase('draw starfield'):
+        # draw the stars
+        starfield.draw(screen, background_speed)
 
-    # draw the nearfield space objects
-    for so in space_objects:
-        so.draw()
+        # draw the nearfield space objects
+        for so in space_objects:
+            so.draw()
 
 
 def run_game_over_screen():
-    global game_state, player, boss, boss_projectiles, background_speed
+    global game_state, player, boss, background_speed
 
     # draw a starry background
     screen.fill(BLACK)
@@ -1817,7 +3756,7 @@ def run_game_over_screen():
     draw_boss_text()
 
     # check for enter key to start a new game
-    keys = pygame.key.get_pressed()
+    keys = get_pressed_keys()
 
     # check for joystick input
     joy_weapon_upgrade = False
@@ -1834,7 +3773,7 @@ def run_game_over_screen():
         player.y = height / 2 - player.h * player.scale / 2
         boss.x = boss_start_position()
         boss.y = height / 2 - boss.h * boss.scale / 2
-        boss_projectiles = []
+        boss_projectiles.clear()
         game_state = GameState.Game
 
     # check for a key press of escape
@@ -1844,7 +3783,7 @@ def run_game_over_screen():
     draw_score_line()
 
     # update the screen
-    pygame.display.flip()
+    present_screen()
 
 
 def run_level_up_screen():
@@ -1878,7 +3817,7 @@ def run_level_up_screen():
         pygame.draw.rect(screen, color, (card_left, card_top, card_width, card_height), 3, 10)
 
         # draw the number of the card at the top center of the card
-        text_card_number = font.render(str(i + 1), True, color)
+        text_card_number = render_text(font, str(i + 1), color)
         screen.blit(text_card_number, (card_center - text_card_number.get_width() / 2, card_top + 10))
         screen.blit(text_card_number, (card_center - text_card_number.get_width() / 2, card_top + card_height - text_card_number.get_height() - 10))
 
@@ -1890,17 +3829,17 @@ def run_level_up_screen():
 
         # draw the card text based on the upgrade_offers
         # and their text data in the upgrades dictionary
-        text_card_title = font_small.render(card_name, True, color)
-        text_card_info_1 = font_tiny.render(card_info_1, True, color)
-        text_card_info_2 = font_tiny.render(card_info_2, True, color)
-        text_card_info_3 = font_tiny.render(card_info_3, True, color)
+        text_card_title = render_text(font_small, card_name, color)
+        text_card_info_1 = render_text(font_tiny, card_info_1, color)
+        text_card_info_2 = render_text(font_tiny, card_info_2, color)
+        text_card_info_3 = render_text(font_tiny, card_info_3, color)
         screen.blit(text_card_title, (card_center - text_card_title.get_width() / 2, top_line_y + 10))
         screen.blit(text_card_info_1, (card_center - text_card_info_1.get_width() / 2, top_line_y + 50))
         screen.blit(text_card_info_2, (card_center - text_card_info_2.get_width() / 2, top_line_y + 75))
         screen.blit(text_card_info_3, (card_center - text_card_info_3.get_width() / 2, top_line_y + 100))
 
     # check for enter key to level up weapon
-    keys = pygame.key.get_pressed()
+    keys = get_pressed_keys()
 
 
 
@@ -1960,7 +3899,7 @@ def run_level_up_screen():
     draw_score_line()
 
     # update the screen
-    pygame.display.flip()
+    present_screen()
 
 
 def run_start_level_screen():
@@ -1987,17 +3926,17 @@ def run_start_level_screen():
     if state_current_frame() == 0:
         boss_warning = boss.level % 4 + 1
         if boss_warning == 1:
-            pygame.mixer.Sound.play(sfx['comm_bird'])
+            pygame.mixer.Sound.play(get_sfx('comm_bird'))
         elif boss_warning == 2:
-            pygame.mixer.Sound.play(sfx['comm_fox'])
+            pygame.mixer.Sound.play(get_sfx('comm_fox'))
         elif boss_warning == 3:
-            pygame.mixer.Sound.play(sfx['comm_bunny'])
+            pygame.mixer.Sound.play(get_sfx('comm_bunny'))
         elif boss_warning == 4:
-            pygame.mixer.Sound.play(sfx['comm_bunny'])
+            pygame.mixer.Sound.play(get_sfx('comm_bunny'))
 
     if state_current_frame() > 20 * fps_scaler():
         # draw the bosses name text below the threat detected text
-        boss_name_text = font_large.render(boss.name, True, (255, 0, 0))
+        boss_name_text = render_text(font_large, boss.name, (255, 0, 0))
 
         screen.blit(boss_name_text, (width / 2 -
                     boss_name_text.get_width()/2, 150))
@@ -2008,14 +3947,56 @@ def run_start_level_screen():
     draw_score_line()
 
     # update the screen
-    pygame.display.flip()
+    present_screen()
 
 
 def state_current_frame():
     return frame_counter - state_start_frame
 
+def state_current_tick():
+    return tick - state_start_tick
+
 def state_current_time():
-    return time.time() - state_start_time
+    return game_time() - state_start_time
+
+
+def game_time():
+    # wall clock time, or the simulated clock when running headless
+    if headless:
+        return simulated_time
+    return time.time()
+
+
+class KeyState:
+    # stands in for pygame.key.get_pressed() with a fixed set of held keys
+    def __init__(self, keys=()):
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+
+class ScriptedInput:
+    # replays key presses for headless runs. the script is a list of
+    # (frame, keys) entries and each set of keys is held from its frame
+    # until the next entry. an empty script never presses anything
+    def __init__(self, script=()):
+        script = sorted((frame, KeyState(keys)) for frame, keys in script)
+        self.frames = [frame for frame, keys in script]
+        self.states = [keys for frame, keys in script]
+
+    def __call__(self):
+        i = bisect.bisect_right(self.frames, frame_counter) - 1
+        if i < 0:
+            return KeyState()
+        return self.states[i]
+
+
+def get_pressed_keys():
+    # the keyboard, unless a scripted input source has replaced it
+    if input_source is not None:
+        return input_source()
+    return pygame.key.get_pressed()
 
 def set_volume(level: int = 100):
     global volume
@@ -2036,194 +4017,290 @@ def change_volume():
 # main entry point for the game
 ###############################################################################
 
-# check if a .gitignore file exists and enable cheats if it does
-if os.path.isfile('.gitignore'):
-    cheats_enabled = True
-
-# start the game
-print("Starting game...")
-pygame.init()
-print("pygame.init() complete. Setting up screen...")
-screen = pygame.display.set_mode(
-    (width, height+60), pygame.FULLSCREEN | pygame.SCALED)
-pygame.display.set_caption(
-    "The Hunt for Roy Carnassus")
-print("Screen setup complete.")
-
-print("Generating font objects...")
-font_large = pygame.font.Font('fonts/PressStart2P.ttf', FONT_SIZE_LARGE)
-font = pygame.font.Font('fonts/PressStart2P.ttf', FONT_SIZE_NORMAL)
-font_small = pygame.font.Font('fonts/PressStart2P.ttf', FONT_SIZE_SMALL)
-font_tiny = pygame.font.Font('fonts/PressStart2P.ttf', FONT_SIZE_TINY)
-
-text_title_heading = font_large.render(
-    "The Hunt for Roy Carnassus", True, (255, 255, 255))
-text_threat_detected = font.render(
-    "THREAT DETECTED !! Sensors indicate...", True, (255, 255, 255), (255,0,0))
-text_title_start = font_large.render(
-    '[space] TO SHOOT', True, (0, 255, 255))
-text_title_deflect = font_large.render(
-    '[tab] TO DEFLECT', True, (0, 255, 255))
-text_title_copyright = font.render("Copyright (c) Jack Games 1998", True, (240,240,240))
-
-text_quit_key = font_large.render('[escape] TO QUIT', True, (255, 255, 255))
-text_ship_destroyed = font_large.render('SHIP DESTROYED!', True, (255, 0, 0))
-text_journey_again = font_large.render(
-    '[enter] TO JOURNEY AGAIN', True, (0, 255, 255))
-text_level_up = font_large.render('LEVEL UP!', True, (0, 255, 255))
-text_level_select_an_upgrade = font.render('SELECT AN UPGRADE', True, (0, 255, 255))
-text_level_weapon = font.render('[enter] WEAPON RESEARCH', True, (0, 255, 255))
-text_level_armor = font.render('[tab] DEFENSE RESEARCH', True, (0, 255, 0))
-print("Font objects generated.")
-
-print("Loading sounds...")
-
-# make a dictionary of the sound effect files
-sfx = {
-    "player_hit": pygame.mixer.Sound('sounds/player_hit.wav'),
-    "player_death": pygame.mixer.Sound('sounds/player_death.wav'),
-    "boss_hit": pygame.mixer.Sound('sounds/boss_hit.wav'),
-    "player_heal": pygame.mixer.Sound('sounds/player_heal.wav'),
-    "comm_bird": pygame.mixer.Sound('sounds/comm-bird.ogg'),
-    "comm_bunny": pygame.mixer.Sound('sounds/comm-bunny.ogg'),
-    "comm_fox": pygame.mixer.Sound('sounds/comm-fox.ogg'),
-    "comm_frog": pygame.mixer.Sound('sounds/comm-frog.ogg'),
-    "level_up": pygame.mixer.Sound('sounds/level_up.wav'),
-    "deflect": pygame.mixer.Sound('sounds/deflect.wav'),
-}
+# lists to draw
+player_projectiles = ProjectilePool()
+boss_projectiles = ProjectilePool()
+player_projectile_grid = SpatialHash(GRID_CELL_SIZE, width, height)
+boss_projectile_grid = SpatialHash(GRID_CELL_SIZE, width, height)
+enemy_units = []
+space_objects = []
 
-# make a dictionary of various space images
-images = {
-    # "galaxy": load_image('sprites/parallax-space-background.png'),
-    # "near_planet": load_image('sprites/parallax-space-big-planet.png'),
-    # "far_planet": load_image('sprites/parallax-space-far-planets.png'),
-    # "ring_planet": load_image('sprites/parallax-space-ring-planet.png'),
-    "planet1": load_image('sprites/planet1.png'),
-    "planet2": load_image('sprites/planet2.png'),
-    "planet3": load_image('sprites/planet3.png'),
-    "planet4": load_image('sprites/planet4.png'),
-    "planet5": load_image('sprites/planet5.png'),
-    "planet6": load_image('sprites/planet6.png'),
-    "planet7": load_image('sprites/planet7.png'),
-    "planet10": load_image('sprites/planet10.png'),
-    "planet11": load_image('sprites/planet11.png'),
-    "planet12": load_image('sprites/planet12.png'),
-    "planet13": load_image('sprites/planet13.png'),
-    "planet14": load_image('sprites/planet14.png'),
-    "planet15": load_image('sprites/planet15.png'),
-    "planet16": load_image('sprites/planet16.png'),
-    "planet17": load_image('sprites/planet17.png'),
-    "planet18_0": load_image('sprites/planet18_0.png'),
-    "planet19": load_image('sprites/planet19.png'),
-    "planet20": load_image('sprites/planet20.png'),
+# filled in as the assets load
+sfx = {}
+starfield = None
 
+# the loading screen's generator and the assets streaming in behind the
+# title screen, while they are in progress
+loading = None
+streaming = None
+next_track = None
 
-}
+# the level to jump to once the loading screen finishes
+start_at_level = None
 
+# no controller until init_joystick() finds one
+joystick = None
 
-print("Sounds loaded.")
 
-print("Increasing sound channels...")  # pygame defaults to 8, but we need more
-pygame.mixer.set_num_channels(32)
+def init_screen():
+    global screen
 
-print("Setting volume levels...")
-set_volume(volume)
+    print("Starting game...")
+    pygame.init()
+    print("pygame.init() complete. Setting up screen...")
+    if headless:
+        screen = pygame.display.set_mode((width, height+60))
+    else:
+        screen = pygame.display.set_mode(
+            (width, height+60), pygame.FULLSCREEN | pygame.SCALED)
+    pygame.display.set_caption(
+        "The Hunt for Roy Carnassus")
+    print("Screen setup complete.")
+
+
+def load_fonts():
+    global font_large, font, font_small, font_tiny
+    global text_title_heading, text_threat_detected, text_title_start, text_title_deflect
+    global text_title_copyright, text_quit_key, text_ship_destroyed, text_journey_again
+    global text_level_up, text_level_select_an_upgrade, text_level_weapon, text_level_armor
+
+    print("Generating font objects...")
+    font_large = load_font(FONT_FILE, FONT_SIZE_LARGE)
+    font = load_font(FONT_FILE, FONT_SIZE_NORMAL)
+    font_small = load_font(FONT_FILE, FONT_SIZE_SMALL)
+    font_tiny = load_font(FONT_FILE, FONT_SIZE_TINY)
+
+    text_title_heading = font_large.render(
+        "The Hunt for Roy Carnassus", True, (255, 255, 255))
+    text_threat_detected = font.render(
+        "THREAT DETECTED !! Sensors indicate...", True, (255, 255, 255), (255,0,0))
+    text_title_start = font_large.render(
+        '[space] TO SHOOT', True, (0, 255, 255))
+    text_title_deflect = font_large.render(
+        '[tab] TO DEFLECT', True, (0, 255, 255))
+    text_title_copyright = font.render("Copyright (c) Jack Games 1998", True, (240,240,240))
+
+    text_quit_key = font_large.render('[escape] TO QUIT', True, (255, 255, 255))
+    text_ship_destroyed = font_large.render('SHIP DESTROYED!', True, (255, 0, 0))
+    text_journey_again = font_large.render(
+        '[enter] TO JOURNEY AGAIN', True, (0, 255, 255))
+    text_level_up = font_large.render('LEVEL UP!', True, (0, 255, 255))
+    text_level_select_an_upgrade = font.render('SELECT AN UPGRADE', True, (0, 255, 255))
+    text_level_weapon = font.render('[enter] WEAPON RESEARCH', True, (0, 255, 255))
+    text_level_armor = font.render('[tab] DEFENSE RESEARCH', True, (0, 255, 0))
+    print("Font objects generated.")
+
+
+def load_sounds():
+    global sfx
+
+    print("Loading sounds...")
+
+    # make a dictionary of the sound effects, the streamed ones are added by
+    # get_sfx once they are needed
+    sfx = {name: load_sound(filename) for name, filename in SOUND_FILES.items()
+           if name not in STREAMED_SOUNDS}
+
+    print("Sounds loaded.")
+
+    print("Increasing sound channels...")  # pygame defaults to 8, but we need more
+    pygame.mixer.set_num_channels(32)
+
+    print("Setting volume levels...")
+    set_volume(volume)
 
-print("Initializing game clock...")
-clock = pygame.time.Clock()
-done = False
 
-# lists to draw
-stars = []
-player_projectiles = []
-boss_projectiles = []
-enemy_units = []
-space_objects = []
+def load_images():
+    global images, meatball, noodle, controls, player_torpedo
+    global meatball_atlas, noodle_atlas, player_torpedo_atlas
+
+    # make a dictionary of various space images
+    images = {name: load_image('sprites/' + name + '.png') for name in PLANET_IMAGES}
+
+    meatball = load_image(*MEATBALL_SPRITE)
+    noodle = load_image(*NOODLE_SPRITE)
+    controls = load_image(*CONTROLS_SPRITE)
+    player_torpedo = load_image(*PLAYER_TORPEDO_SPRITE)
+
+    # spinning and flipped projectile sprites are drawn from prerotated frames
+    meatball_atlas = RotationAtlas(meatball)
+    noodle_atlas = RotationAtlas(noodle)
+    player_torpedo_atlas = RotationAtlas(player_torpedo)
+    projectile_renderer.prerender(PROJECTILE_CIRCLES)
+
+    # spinning sprites collide with their whole sprite rather than a circle
+    sprite_reach[ProjectileType.Meatball] = meatball_atlas.reach
+    sprite_reach[ProjectileType.Noodle] = noodle_atlas.reach
+
+
+def create_game_objects():
+    global starfield, player, boss
+
+    print("Seeding starfield...")
+    starfield = Starfield(starfield_size, width, height)
+
+    player = Ship(*PLAYER_SPRITE)
+    player.type = MOB_TYPE_PLAYER
+    player.max_hp = 15
+    player.hp = player.max_hp
+    player.x = 100
+    player.deaths = 0
+    player.score = 0
+    player.life_steal = 0
+    player.add_weapon(ProjectileType.ForwardTorpedo)
+
+    boss = Ship(*PLACEHOLDER_BOSS_SPRITE)
+    boss.type = MOB_TYPE_BOSS
+    boss.level = 1
+    boss.max_hp = BOSS_BASE_HEALTH
+    boss.hp = boss.max_hp
+    load_boss()
+
+    # space_objects.append(SpaceObject('ring_planet'))
+    # space_objects.append(SpaceObject('far_planet'))
+    # space_objects.append(SpaceObject('near_planet'))
+    space_objects.append(SpaceObject('planet1'))
+    space_objects.append(SpaceObject('planet2'))
+    space_objects.append(SpaceObject('planet3'))
+    space_objects.append(SpaceObject('planet4'))
+    space_objects.append(SpaceObject('planet5'))
+    space_objects.append(SpaceObject('planet6'))
+    space_objects.append(SpaceObject('planet7'))
+    space_objects.append(SpaceObject('planet10'))
+    space_objects.append(SpaceObject('planet11'))
+    space_objects.append(SpaceObject('planet12'))
+    space_objects.append(SpaceObject('planet13'))
+    space_objects.append(SpaceObject('planet14'))
+    space_objects.append(SpaceObject('planet15'))
+    space_objects.append(SpaceObject('planet16'))
+    space_objects.append(SpaceObject('planet17'))
+    space_objects.append(SpaceObject('planet18_0'))
+    space_objects.append(SpaceObject('planet19'))
+    space_objects.append(SpaceObject('planet20'))
+
+    # boss.flip_h()
+    boss.x = boss_start_position()
+    boss.y = height/2
+
+
+def init_joystick():
+    global joystick
+
+    # start joystick control and select the default joystick
+    joystick = None
+    try:
+        pygame.joystick.init()
+        joystick = pygame.joystick.Joystick(0)
+    except:
+        print("No joystick found.")
+        joystick = None
+
+
+def setup_game(run_headless=False, use_bundle=True):
+    global headless, cheats_enabled, clock, done, time_frame_start, state_start_time
+    global game_state, last_game_state, loading
+
+    headless = run_headless
+
+    # check if a .gitignore file exists and enable cheats if it does
+    if os.path.isfile('.gitignore'):
+        cheats_enabled = True
+
+    if headless:
+        # no window, no sound card and no controller
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    init_screen()
+    if use_bundle:
+        open_asset_bundle()
+
+    # the loading screen needs the fonts before anything else
+    load_fonts()
+
+    if headless:
+        # nothing to look at, so load it all up front
+        load_assets()
+        load_sounds()
+        load_images()
+        create_game_objects()
+    else:
+        loading = loading_steps()
+        game_state = last_game_state = GameState.Loading
+        init_joystick()
 
+    print("Initializing game clock...")
+    clock = pygame.time.Clock()
+    done = False
+    time_frame_start = game_time()
+    state_start_time = game_time()
 
-print("Seeding starfield...")
-for i in range(starfield_size):
-    stars.append(Star())
-
-player = Ship("ships/kenney-ship-3.png", scale=0.5)
-player.type = MOB_TYPE_PLAYER
-player.max_hp = 15
-player.hp = player.max_hp
-player.x = 100
-player.deaths = 0
-player.score = 0
-player.life_steal = 0
-player.add_weapon(ProjectileType.ForwardTorpedo)
-
-boss = Ship("ships/ships_3.png", 1, 1, 310, 150, (38, 37, 37), 1)
-boss.type = MOB_TYPE_BOSS
-boss.level = 1
-boss.max_hp = BOSS_BASE_HEALTH
-boss.hp = boss.max_hp
-load_boss()
-
-# space_objects.append(SpaceObject('ring_planet'))
-# space_objects.append(SpaceObject('far_planet'))
-# space_objects.append(SpaceObject('near_planet'))
-space_objects.append(SpaceObject('planet1'))
-space_objects.append(SpaceObject('planet2'))
-space_objects.append(SpaceObject('planet3'))
-space_objects.append(SpaceObject('planet4'))
-space_objects.append(SpaceObject('planet5'))
-space_objects.append(SpaceObject('planet6'))
-space_objects.append(SpaceObject('planet7'))
-space_objects.append(SpaceObject('planet10'))
-space_objects.append(SpaceObject('planet11'))
-space_objects.append(SpaceObject('planet12'))
-space_objects.append(SpaceObject('planet13'))
-space_objects.append(SpaceObject('planet14'))
-space_objects.append(SpaceObject('planet15'))
-space_objects.append(SpaceObject('planet16'))
-space_objects.append(SpaceObject('planet17'))
-space_objects.append(SpaceObject('planet18_0'))
-space_objects.append(SpaceObject('planet19'))
-space_objects.append(SpaceObject('planet20'))
-
-
-meatball = load_image("sprites/jwd-meatball.png")
-noodle = load_image("ships/macaroni.png", scale=0.03)
-controls = load_image("sprites/jwd-move.png")
-player_torpedo = load_image("sprites/kenney-player-torpedo.png", scale=0.75)
-
-
-# boss.flip_h()
-boss.x = boss_start_position()
-boss.y = height/2
-
-# start joystick control and select the default joystick
-joystick = None
-try:
-    pygame.joystick.init()
-    joystick = pygame.joystick.Joystick(0)
-except:
-    print("No joystick found.")
-    joystick = None
+    if loading is None:
+        print_startup_time()
+
+
+def print_startup_time():
+    print("Startup took " + "{0:.1f}".format((time.perf_counter() - launch_time) * 1000) + " ms.")
+
+
+def stop_loading():
+    # stop any loading still in progress before pygame quits
+    global loading, streaming
+
+    if loading is not None:
+        loading.close()
+        loading = None
+    if streaming is not None:
+        streaming.cancel()
+        streaming = None
+    boss_loader.shutdown()
 
 
 def handle_jukebox():
+    # headless runs have nothing to listen to so skip loading the music
+    if headless:
+        return
+
+    global next_track
+
     if not pygame.mixer.music.get_busy():
-        pygame.mixer.music.load(random.choice(JUKEBOX))
+        if next_track is None:
+            next_track = random.choice(JUKEBOX)
+
+        # the first track streams in behind the title screen, wait for it
+        # rather than reading it a second time
+        if streaming is not None and streaming.is_pending('music', next_track):
+            return
+
+        data = loaded_music.pop(next_track, None)
+        if data is not None:
+            pygame.mixer.music.load(io.BytesIO(data), os.path.splitext(next_track)[1][1:])
+        else:
+            pygame.mixer.music.load(next_track)
         pygame.mixer.music.play()
+        next_track = None
 
 
-# Begin main loop
-while not done:
+def run_frame():
+    global done, frame_counter, last_game_state, state_start_frame, state_start_time
+    global dps, last_damage_done, dt, time_frame_start, simulated_time
 
-    handle_game_events()
-    handle_jukebox()
+    profiler.begin_frame()
+
+    with profiler.phase('events'):
+        handle_game_events()
+        if game_state != GameState.Loading:
+            stream_assets()
+            handle_jukebox()
 
     # check the game state and perform the appropriate actions
     match game_state:
+        case GameState.Loading:
+            run_loading_screen()
         case GameState.Title:
             run_title_screen()
         case GameState.Game:
-            update_game()
-            draw_screen()
+            run_game()
         case GameState.Victory:
             run_victory_screen()
         case GameState.LevelUp:
@@ -2250,22 +4327,167 @@ while not done:
 
         last_game_state = game_state
         state_start_frame = frame_counter
-        state_start_time = time.time()
+        state_start_time = game_time()
 
     # console the frame rate
     if(frame_counter % fps == 0):
         dps = damage_done - last_damage_done
         last_damage_done = damage_done
-        print("Frame Rate: " + str(round(clock.get_fps())) +
-              ", Game State: " + str(game_state) + ", State Time: " +
-              str(time.time() - state_start_time) + ", DPS: " + str(dps) +
-              ", Last dt: " + str(dt)
-              )
+        if not headless:
+            print("Frame Rate: " + str(round(clock.get_fps())) +
+                  ", Game State: " + str(game_state) + ", State Time: " +
+                  str(state_current_time()) + ", DPS: " + str(dps) +
+                  ", Last dt: " + str(dt)
+                  )
+
+    profiler.end_frame()
+
+    if headless:
+        # run as fast as possible and advance the simulated clock by exactly
+        # one frame so the game plays out the same as it would at fps
+        clock.tick()
+        dt = 1 / fps
+        simulated_time += dt
+    else:
+        # limit to 60 frames per second
+        dt = clock.tick(fps) / 1000
+    time_frame_start = game_time()
+
+
+def start_level(level):
+    # jump straight into the fight against the boss of the given level
+    global game_state, last_game_state, state_start_frame, state_start_time
+
+    boss.level = level
+    boss.max_hp = BOSS_BASE_HEALTH * 1.5 ** (level - 1)
+    boss.hp = boss.max_hp
+    player.level = level
+    load_boss()
+
+    player.x = 100
+    player.y = height / 2 - player.h * player.scale / 2
+    boss.x = boss_start_position()
+    boss.y = height / 2 - boss.h * boss.scale / 2
+    boss.vx = 0
+    boss.vy = 0
+
+    game_state = last_game_state = GameState.Game
+    state_start_frame = frame_counter
+    state_start_time = game_time()
+
+
+def run_headless(frames):
+    # step the game state machine without throttling and report how many
+    # frames per second the simulation manages
+    start = time.perf_counter()
+    first_frame = frame_counter
+
+    while not done and frame_counter - first_frame < frames:
+        run_frame()
+
+    simulated = frame_counter - first_frame
+    elapsed = time.perf_counter() - start
+    print("Simulated " + str(simulated) + " frames in " +
+          "{0:.3f}".format(elapsed) + "s (" +
+          "{0:.1f}".format(simulated / elapsed) + " fps)")
+    return simulated / elapsed
+
+
+def bake_assets():
+    # bake every sprite the game can load, including the damaged variants
+    # and every boss, then remove baked files nothing uses any more and pack
+    # it all into the asset bundle. run after setup_game() so the title
+    # screen assets are already baked
+    start = time.perf_counter()
+
+    sprites = [PLAYER_SPRITE] + TRASH_SPRITES
+    for level in range(1, 16):
+        name, sprite, flip = boss_design(level)
+        sprites.append(sprite)
+
+    for sprite in sprites:
+        load_sprite(*sprite).get_damaged()
+
+    removed = 0
+    for entry in os.listdir(BAKED_ASSET_DIR):
+        path = os.path.join(BAKED_ASSET_DIR, entry)
+        if path not in baked_paths:
+            os.remove(path)
+            removed += 1
+
+    print("Baked " + str(len(os.listdir(BAKED_ASSET_DIR))) + " images in " +
+          "{0:.3f}".format(time.perf_counter() - start) + "s, removed " +
+          str(removed) + " stale")
+
+    write_asset_bundle(ASSET_BUNDLE)
+
+
+def load_input_script(filename):
+    # a script is a json list of [frame, ["K_SPACE", "K_UP", ...]] entries
+    with open(filename) as f:
+        script = json.load(f)
+    return ScriptedInput(
+        (frame, [getattr(pygame, key) for key in keys]) for frame, keys in script)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="The Hunt for Roy Carnassus")
+    parser.add_argument('--headless', action='store_true',
+                        help="run the simulation without a window, sound or frame limit")
+    parser.add_argument('--frames', type=int, default=3600,
+                        help="number of frames to simulate when headless")
+    parser.add_argument('--level', type=int, default=None,
+                        help="start straight in the fight against this boss level")
+    parser.add_argument('--script', default=None,
+                        help="json file of scripted key presses for headless runs")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed the random number generators")
+    parser.add_argument('--bake', action='store_true',
+                        help="bake every sprite into " + BAKED_ASSET_DIR + "/ and exit")
+    return parser.parse_args()
+
+
+def main():
+    global input_source, start_at_level
+
+    args = parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    # baking builds the bundle, so it must not read from the old one
+    setup_game(args.headless or args.bake, not args.bake)
+
+    if args.bake:
+        bake_assets()
+        pygame.quit()
+        return
+
+    if args.headless:
+        # nobody is at the keyboard, use the script or press nothing at all
+        if args.script is not None:
+            input_source = load_input_script(args.script)
+        else:
+            input_source = ScriptedInput()
+
+    if args.level is not None:
+        if loading is not None:
+            start_at_level = args.level
+        else:
+            start_level(args.level)
+
+    if args.headless:
+        run_headless(args.frames)
+    else:
+        # Begin main loop
+        while not done:
+            run_frame()
 
-    # limit to 60 frames per second
-    dt = clock.tick(fps) / 1000
-    time_frame_start = time.time()
+    # quit pygame and clean up
+    stop_loading()
+    pygame.quit()
 
 
-# quit pygame and clean up
-pygame.quit()
+if __name__ == '__main__':
+    main()
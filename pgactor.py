@@ -2,7 +2,77 @@ import pygame
 import os
 
 
+def index_sheets(sprites):
+    # group the frames named "<sheet>-<number>" into a tuple per sheet in
+    # frame order, so drawing is a tuple index instead of a string lookup
+    numbered = {}
+    for key, frame in sprites.items():
+        sheet, _, number = key.rpartition("-")
+        if sheet and number.isdigit():
+            numbered.setdefault(sheet, []).append((int(number), frame))
+
+    return {
+        sheet: tuple(frame for number, frame in sorted(frames, key=lambda item: item[0]))
+        for sheet, frames in numbered.items()
+    }
+
+
+def decode_sheets(sheet_folder, dimensions: list | None = None, scale=1.0):
+    # read every png in the folder into a dictionary of frames
+    sprites = {}
+    h = 0
+    w = 0
+    if dimensions is not None:
+        h = dimensions[0]
+        w = dimensions[1]
+
+    # load all files in a directory
+    for file in os.listdir(sheet_folder):
+        if file.lower().endswith(".png"):
+            # remove png from the filename and store it in frame_base_name
+            frame_base_name = file[:-4]
+
+            frame = pygame.image.load(os.path.join(
+                sheet_folder, file)).convert_alpha()
+
+            if dimensions is None:
+                if scale == 1.0:
+                    sprites[frame_base_name] = frame
+                else:
+                    sprites[frame_base_name] = pygame.transform.scale(
+                        frame, (int(frame.get_width() * scale), int(frame.get_height() * scale)))
+            else:
+                # calculate how many rows and columns are in the sheet
+                rows = frame.get_height() // h
+                cols = frame.get_width() // w
+                frame_base_number = 0
+                for row in range(rows):
+                    for col in range(cols):
+                        frame_key = frame_base_name + \
+                            "-" + str(frame_base_number)
+
+                        if scale == 1.0:
+                            sprites[frame_key] = frame.subsurface(
+                                pygame.Rect(w * col, h * row, w, h))
+                        else:
+                            # capture the base frame
+                            base_frame = frame.subsurface(
+                                pygame.Rect(w * col, h * row, w, h))
+
+                            # scale the base frame
+                            sprites[frame_key] = pygame.transform.scale(
+                                base_frame, (int(base_frame.get_width() * scale), int(base_frame.get_height() * scale)))
+
+                        frame_base_number += 1
+
+    return sprites
+
+
 class Actor():
+    # decoded frames shared by every actor, keyed by (folder, dimensions,
+    # scale) and holding the sprites dictionary and the sheet index
+    sheet_cache = {}
+
     def __init__(self, folder, position=(0, 0), sheet: str = "idle", scale=1.0, dimensions=None):
         self.x, self.y = position
         self.sheet: str = sheet
@@ -11,67 +81,46 @@ class Actor():
         self.animation_length = 1
         self.animation_completed = False
         self.sprites = {}
+        self.sheets = {}
+        self.frames = ()
         self.scale = scale
         self.load_sheets(folder, dimensions)
         self.set_sheet(sheet)
 
+    @staticmethod
+    def sheet_key(folder, scale=1.0, dimensions=None):
+        return (folder, tuple(dimensions) if dimensions is not None else None, scale)
+
+    @classmethod
+    def preload(cls, folder, scale=1.0, dimensions=None):
+        # decode a folder of sheets once so every actor made from it shares
+        # the same frames
+        key = cls.sheet_key(folder, scale, dimensions)
+        if key not in cls.sheet_cache:
+            sprites = decode_sheets(folder, dimensions, scale)
+            cls.sheet_cache[key] = (sprites, index_sheets(sprites))
+        return cls.sheet_cache[key]
+
+    @classmethod
+    def evict(cls, folder=None):
+        # forget every size of a folder's sheets, or every sheet when no
+        # folder is given. actors already made keep their frames
+        if folder is None:
+            cls.sheet_cache.clear()
+        else:
+            for key in [key for key in cls.sheet_cache if key[0] == folder]:
+                del cls.sheet_cache[key]
+
     def set_sheet(self, sheet: str):
         self.sheet = sheet
         self.frame = 0
         self.animation_length = 0
         self.animation_completed = False
-        # check how many frames are in the sprite dictionary that start with the sheet name
-        for key in self.sprites.keys():
-            if key.startswith(self.sheet):
-                self.animation_length += 1
+        self.frames = self.sheets.get(sheet, ())
+        self.animation_length = len(self.frames)
 
     def load_sheets(self, sheet_folder, dimensions: list | None = None):
-        # set self.sprites to a an empty dictionary
-        self.sprites = {}
-        h = 0
-        w = 0
-        if dimensions is not None:
-            h = dimensions[0]
-            w = dimensions[1]
-
-        # load all files in a directory
-        for file in os.listdir(sheet_folder):
-            if file.lower().endswith(".png"):
-                # remove png from the filename and store it in frame_base_name
-                frame_base_name = file[:-4]
-
-                frame = pygame.image.load(os.path.join(
-                    sheet_folder, file)).convert_alpha()
-
-                if dimensions is None:
-                    if self.scale == 1.0:
-                        self.sprites[frame_base_name] = frame
-                    else:
-                        self.sprites[frame_base_name] = pygame.transform.scale(
-                            frame, (int(frame.get_width() * self.scale), int(frame.get_height() * self.scale)))
-                else:
-                    # calculate how many rows and columns are in the sheet
-                    rows = frame.get_height() // h
-                    cols = frame.get_width() // w
-                    frame_base_number = 0
-                    for row in range(rows):
-                        for col in range(cols):
-                            frame_key = frame_base_name + \
-                                "-" + str(frame_base_number)
-
-                            if self.scale == 1.0:
-                                self.sprites[frame_key] = frame.subsurface(
-                                    pygame.Rect(w * col, h * row, w, h))
-                            else:
-                                # capture the base frame
-                                base_frame = frame.subsurface(
-                                    pygame.Rect(w * col, h * row, w, h))
-
-                                # scale the base frame
-                                self.sprites[frame_key] = pygame.transform.scale(
-                                    base_frame, (int(base_frame.get_width() * self.scale), int(base_frame.get_height() * self.scale)))
-
-                            frame_base_number += 1
+        self.sprites, self.sheets = Actor.preload(sheet_folder, self.scale, dimensions)
 
     def move(self, vx, vy):
         self.x += vx
@@ -84,17 +133,73 @@ class Actor():
         self.frame = 0
         self.animation_completed = False
 
-    def draw(self, surface):
-
-        # calculate our frame number
-        frame_number = int(
-            self.frame / self.animation_rate) % self.animation_length
-        frame_key = self.sheet + "-" + str(frame_number)
-
-        # draw the frame onto the surface
-        surface.blit(self.sprites[frame_key], (self.x, self.y))
+    def current_frame(self):
+        return self.frames[int(self.frame / self.animation_rate) % self.animation_length]
 
+    def advance(self):
         self.frame += 1
 
         if self.frame >= self.animation_length * self.animation_rate:
             self.animation_completed = True
+
+    def draw(self, surface):
+        # draw the frame onto the surface
+        surface.blit(self.current_frame(), (self.x, self.y))
+
+        self.advance()
+
+
+class ActorGroup():
+    # many actors advanced together in one pass and drawn with a single
+    # blits call, for swarms and effects where a blit per actor adds up
+    def __init__(self, actors=()):
+        self.actors = list(actors)
+
+    def __len__(self):
+        return len(self.actors)
+
+    def __iter__(self):
+        return iter(self.actors)
+
+    def add(self, actor: Actor):
+        self.actors.append(actor)
+
+    def remove(self, actor: Actor):
+        self.actors.remove(actor)
+
+    def update(self):
+        # advance every animation by one frame
+        for actor in self.actors:
+            actor.frame += 1
+            if actor.frame >= actor.animation_length * actor.animation_rate:
+                actor.animation_completed = True
+
+    def draw(self, surface, cull=True, advance=True):
+        # draw the current frame of every actor, skipping the ones entirely
+        # outside the surface's clip area when culling. returns how many
+        # were drawn
+        area = surface.get_clip()
+        left, top, right, bottom = area.left, area.top, area.right, area.bottom
+
+        sequence = []
+        for actor in self.actors:
+            if not actor.animation_length:
+                continue
+
+            frame = actor.frames[int(actor.frame / actor.animation_rate) % actor.animation_length]
+            x, y = actor.x, actor.y
+            if cull and (x >= right or y >= bottom or
+                         x + frame.get_width() <= left or y + frame.get_height() <= top):
+                continue
+            sequence.append((frame, (x, y)))
+
+        # pygame-ce has a faster blits that returns nothing
+        if hasattr(surface, "fblits"):
+            surface.fblits(sequence)
+        else:
+            surface.blits(sequence, doreturn=False)
+
+        if advance:
+            self.update()
+
+        return len(sequence)